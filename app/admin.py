@@ -1,11 +1,14 @@
 from django.contrib import admin
-from .models import Products, Customer, Cart, Payment, OrderPlaced
+from .models import CATEGORY_CHOICES, Products, Customer, Cart, Payment, Order, OrderPlaced, SalesRollup
+from .reports import DASHBOARD_DAYS, DASHBOARD_MAX_DAYS, daily_category_sales
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
 from django.contrib.auth.models import Group
 
 # Register your models here.
 @admin.register(Products)
 class ProductModelAdmin(admin.ModelAdmin):
-    list_display = ['id', 'title', 'discounted_price', 'category', 'product_image']
+    list_display = ['id', 'title', 'discounted_price', 'category', 'product_image', 'version']
 
 @admin.register(Customer)
 class CustomerModelAdmin(admin.ModelAdmin):
@@ -19,8 +22,73 @@ class CartModelAdmin(admin.ModelAdmin):
 class PaymentModelAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'amount', 'razorpay_order_id', 'razorpay_payment_status', 'razorpay_payment_id', 'paid']
 
+class OrderPlacedInline(admin.TabularInline):
+    model = OrderPlaced
+    fields = ['product', 'quantity', 'unit_price', 'line_total', 'status']
+    readonly_fields = fields
+    extra = 0
+
+@admin.register(Order)
+class OrderModelAdmin(admin.ModelAdmin):
+    """
+    Edits the status of an order on the order itself, which the customer's
+    order page shows, and copies it to the order's lines.
+
+    """
+    list_display = ['id', 'user', 'customer', 'item_count', 'total', 'status', 'created']
+    list_filter = ['status']
+    list_select_related = ['user', 'customer']
+    readonly_fields = ['payment', 'item_count', 'amount', 'shipping', 'total']
+    inlines = [OrderPlacedInline]
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'status' in form.changed_data:
+            obj.lines.update(status=obj.status)
+
 @admin.register(OrderPlaced)
 class OrderPlaced(admin.ModelAdmin):
     list_display = ['id', 'user', 'customer', 'product', 'quantity', 'ordered_date', 'status', 'payment']
+    # Set through the order, see OrderModelAdmin.
+    readonly_fields = ['status']
+
+@admin.register(SalesRollup)
+class SalesRollupAdmin(admin.ModelAdmin):
+    """
+    Shows the sales dashboard in place of the change list. The dashboard
+    reads the daily rollups only, never the order lines.
+
+    """
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        try:
+            days = min(max(1, int(request.GET.get('days', DASHBOARD_DAYS))), DASHBOARD_MAX_DAYS)
+        except (ValueError, OverflowError):
+            days = DASHBOARD_DAYS
+        rows = daily_category_sales(days)
+        categories = dict(CATEGORY_CHOICES)
+        for row in rows:
+            row['category_name'] = categories.get(row['category'], row['category'])
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Sales dashboard',
+            'opts': self.model._meta,
+            'days': days,
+            'rows': rows,
+            'total_units': sum(row['units'] for row in rows),
+            'total_revenue': sum(row['revenue'] for row in rows),
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, 'admin/app/salesrollup/dashboard.html', context)
 
 admin.site.unregister(Group)
\ No newline at end of file
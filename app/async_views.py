@@ -0,0 +1,151 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import aget_object_or_404, render
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import ensure_csrf_cookie
+from .cart import aget_cart_summary, aprice_cart
+from .catalog import CATEGORY_PAGE_SIZE, acategory_titles
+from .models import Products
+from .pagination import akeyset_paginate
+from .search import asearch_products
+
+# Async versions of the hot read-only pages, routed by app/urls.py instead of
+# their app.views counterparts when settings.ASYNC_VIEWS is on (under ASGI).
+# All database and cache access of the views goes through the async APIs;
+# whatever the templates need from the database is fetched before rendering.
+# Rendering itself still reads the {% cache %} fragments and checks the
+# storage for thumbnails with blocking calls, so it runs in a thread.
+
+
+async def _render(request, template_name, context):
+    """
+    Renders a template off the event loop.
+
+    """
+    return await sync_to_async(render)(request, template_name, context)
+
+
+async def _prepare(request):
+    """
+    Resolves the user and the cart badge summary asynchronously, so that
+    neither the templates nor the cart_summary context processor have to
+    query the database from the event loop.
+
+    """
+    request.user = await request.auser()
+    request.cart_summary = await aget_cart_summary(request.user)
+
+
+@login_required
+async def home(request):
+    """
+    Renders the home page.
+
+    Args:
+        request: The HTTP request object.
+
+    Returns:
+        The rendered home.html template.
+
+    """
+    await _prepare(request)
+    return await _render(request, "app/home.html", locals())
+
+
+@method_decorator(login_required, name='get')
+class CategoryView(View):
+    """
+    Displays a page of the products of a category.
+
+    """
+    async def get(self, request, val):
+        """
+        Handles the GET request for the category view.
+
+        Args:
+            request: The HTTP request object.
+            val: The category value used for filtering products.
+
+        Returns:
+            The rendered category.html template with the following context variables:
+                - products: A page of the products filtered by the given category value.
+                - title: The cached titles of the products filtered by the given category value.
+
+        """
+        await _prepare(request)
+        products = await akeyset_paginate(
+            Products.objects.filter(category=val), ['id'], request.GET.get('after'), CATEGORY_PAGE_SIZE,
+        )
+        title = await acategory_titles(val)
+        return await _render(request, "app/category.html", locals())
+
+
+@method_decorator(login_required, name='get')
+class ProductDetail(View):
+    """
+    Displays the details of a product.
+
+    """
+    async def get(self, request, pk):
+        """
+        Handles the GET request for the product detail view.
+
+        Args:
+            request: The HTTP request object.
+            pk: The primary key of the product.
+
+        Returns:
+            The rendered productdetail.html template with the following context variables:
+                - products: The product with the given primary key.
+
+        """
+        await _prepare(request)
+        products = await aget_object_or_404(Products, pk=pk)
+        return await _render(request, "app/productdetail.html", locals())
+
+
+@login_required
+async def search(request):
+    """
+    Renders the searched item product page.
+
+    Args:
+        request: The HTTP request object.
+
+    Returns:
+        The rendered search.html template with the following context variables:
+            - query: The search text.
+            - product: A page of the matching products, most relevant first.
+
+    """
+    await _prepare(request)
+    query = request.GET.get('search', '')
+    product = await asearch_products(query, cursor=request.GET.get('after'))
+    return await _render(request, "app/search.html", locals())
+
+
+@login_required
+@ensure_csrf_cookie
+async def show_cart(request):
+    """
+    Handles displaying the user's cart.
+
+    Args:
+        request: The HTTP request object.
+
+    Returns:
+        The rendered addtocart.html template with the following context variables:
+            - user: The current user.
+            - cart: The Cart objects associated with the user, each with a line_total.
+            - amount: The total amount of the products in the cart (before adding shipping cost).
+            - totalamount: The total amount of the products in the cart (including shipping cost).
+
+    """
+    await _prepare(request)
+    user = request.user
+    pricing = await aprice_cart(user)
+    cart = pricing['lines']
+    amount = pricing['amount']
+    totalamount = pricing['totalamount']
+    return await _render(request, 'app/addtocart.html', locals())
@@ -0,0 +1,117 @@
+import math
+import time
+from collections import defaultdict
+
+
+def percentile(sorted_values, pct):
+    """
+    Returns a percentile of a sorted list using the nearest-rank method.
+
+    Args:
+        sorted_values: The values in ascending order.
+        pct: The percentile, between 0 and 100.
+
+    Returns:
+        The value at that percentile, or 0 for an empty list.
+
+    """
+    if not sorted_values:
+        return 0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, elapsed):
+    """
+    Summarizes the latencies of a benchmark run.
+
+    Args:
+        latencies: The duration of each request, in seconds.
+        elapsed: The wall-clock duration of the whole run, in seconds.
+
+    Returns:
+        A dict with the request count, throughput (requests/s) and the mean,
+        p50, p95 and p99 latencies in milliseconds.
+
+    """
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'throughput': len(ordered) / elapsed if elapsed else 0,
+        'mean_ms': sum(ordered) / len(ordered) * 1000 if ordered else 0,
+        'p50_ms': percentile(ordered, 50) * 1000,
+        'p95_ms': percentile(ordered, 95) * 1000,
+        'p99_ms': percentile(ordered, 99) * 1000,
+    }
+
+
+class BenchmarkResults:
+    """
+    Collects the latency and query count of each request of a benchmark,
+    grouped by URL name.
+
+    """
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.started = time.perf_counter()
+        self.elapsed = None
+
+    def record(self, url_name, latency, queries=None):
+        """
+        Records one request.
+
+        Args:
+            url_name: The URL name of the page, e.g. 'product-detail'.
+            latency: The duration of the request, in seconds.
+            queries: The number of queries it ran, or None if unknown.
+
+        """
+        self.latencies[url_name].append(latency)
+        if queries is not None:
+            self.queries[url_name].append(queries)
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    def report(self):
+        """
+        Returns the summary of the run as a JSON-serializable dict.
+
+        Returns:
+            A dict with an 'overall' summary and a 'urls' dict mapping each URL
+            name to its summary and mean/max query counts.
+
+        """
+        elapsed = self.elapsed if self.elapsed is not None else time.perf_counter() - self.started
+        all_latencies = [latency for latencies in self.latencies.values() for latency in latencies]
+        urls = {}
+        for name, latencies in sorted(self.latencies.items()):
+            stats = summarize(latencies, elapsed)
+            queries = self.queries.get(name)
+            stats['queries_mean'] = sum(queries) / len(queries) if queries else None
+            stats['queries_max'] = max(queries) if queries else None
+            urls[name] = stats
+        return {'overall': summarize(all_latencies, elapsed), 'urls': urls}
+
+
+def compare(previous, current):
+    """
+    Compares two reports produced by BenchmarkResults.report.
+
+    Returns:
+        A list of (url name, p95 change in percent, change of mean query count) tuples,
+        for the URL names present in both reports.
+
+    """
+    changes = []
+    for name, stats in current['urls'].items():
+        before = previous['urls'].get(name)
+        if before is None:
+            continue
+        p95 = (stats['p95_ms'] / before['p95_ms'] - 1) * 100 if before['p95_ms'] else 0
+        queries = None
+        if stats['queries_mean'] is not None and before['queries_mean'] is not None:
+            queries = stats['queries_mean'] - before['queries_mean']
+        changes.append((name, p95, queries))
+    return changes
@@ -0,0 +1,267 @@
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from .models import Cart, Products
+from .routers import record_write
+
+SHIPPING_COST = 40
+CART_SUMMARY_KEY = 'cart-summary:{}'
+CART_SUMMARY_TIMEOUT = 60 * 60
+# The largest quantity change a cart batch may apply to one product.
+MAX_CART_DELTA = 1000
+
+
+def line_total_expression():
+    """
+    Builds the database expression pricing a cart line.
+
+    Returns:
+        An expression computing quantity * product's discounted price.
+
+    """
+    return ExpressionWrapper(F('quantity') * F('product__discounted_price'), output_field=FloatField())
+
+
+def line_total(item):
+    """
+    Returns the total cost of a cart line.
+
+    Uses the line_total annotation added by priced_lines when present, so
+    priced carts never fall back to a per-line product lookup.
+
+    Args:
+        item: The Cart object.
+
+    Returns:
+        The total cost of the cart line (quantity * product's discounted price).
+
+    """
+    if 'line_total' in item.__dict__:
+        return item.line_total
+    return item.quantity * item.product.discounted_price
+
+
+def priced_lines(user):
+    """
+    Returns the user's cart lines with their products and line totals.
+
+    Args:
+        user: The user whose cart is priced.
+
+    Returns:
+        A queryset of Cart objects joined to their product and annotated with line_total.
+
+    """
+    return (
+        Cart.objects.filter(user=user)
+        .select_related('product')
+        .annotate(line_total=line_total_expression())
+        .order_by('id')
+    )
+
+
+def price_cart(user):
+    """
+    Prices the user's whole cart in a single query.
+
+    Args:
+        user: The user whose cart is priced.
+
+    Returns:
+        A dict with the following keys:
+            - lines: The Cart objects associated with the user, each with a line_total.
+            - amount: The total amount of the products in the cart (before adding shipping cost).
+            - totalamount: The total amount of the products in the cart (including shipping cost).
+
+    """
+    return _cart_pricing(list(priced_lines(user)))
+
+
+async def aprice_cart(user):
+    """
+    Async version of price_cart, fetching the lines with the async ORM.
+
+    """
+    return _cart_pricing([item async for item in priced_lines(user)])
+
+
+def _cart_pricing(lines):
+    amount = sum(item.line_total for item in lines)
+    return {'lines': lines, 'amount': amount, 'totalamount': amount + SHIPPING_COST}
+
+
+def cart_totals(user):
+    """
+    Returns the cart amounts without loading the cart lines.
+
+    The subtotal comes from the cached cart summary, so this costs at most
+    one aggregate query.
+
+    Args:
+        user: The user whose cart is priced.
+
+    Returns:
+        A tuple of (amount, totalamount), before and after adding shipping cost.
+
+    """
+    amount = get_cart_summary(user)['subtotal']
+    return amount, amount + SHIPPING_COST
+
+
+def add_product(user, product_id, quantity=1):
+    """
+    Adds a product to the user's cart, or increases its quantity if the
+    product is already in the cart.
+
+    This is a single INSERT ... ON CONFLICT statement relying on the unique
+    (user, product) constraint, so repeated clicks never create duplicate lines.
+
+    Args:
+        user: The user whose cart is updated.
+        product_id: The primary key of the product to add.
+        quantity: The quantity to add.
+
+    Returns:
+        True if the cart was updated, False if the product does not exist.
+
+    """
+    qn = connection.ops.quote_name
+    cart_table = qn(Cart._meta.db_table)
+    user_column = qn(Cart._meta.get_field('user').column)
+    product_column = qn(Cart._meta.get_field('product').column)
+    quantity_column = qn(Cart._meta.get_field('quantity').column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {cart_table} ({user_column}, {product_column}, {quantity_column}) "
+            f"SELECT %s, {qn('id')}, %s FROM {qn(Products._meta.db_table)} WHERE {qn('id')} = %s "
+            f"ON CONFLICT ({user_column}, {product_column}) "
+            f"DO UPDATE SET {quantity_column} = {cart_table}.{quantity_column} + excluded.{quantity_column}",
+            [user.pk, quantity, product_id],
+        )
+        added = cursor.rowcount > 0
+    if added:
+        # Raw SQL bypasses the database router.
+        record_write()
+        invalidate_cart_summary(user.pk)
+    return added
+
+
+def apply_cart_deltas(user, deltas):
+    """
+    Applies a batch of quantity changes to the user's cart in one transaction.
+
+    Quantities are changed with atomic F() updates, so concurrent requests
+    never lose an update, and lines that reach zero are deleted.
+
+    Args:
+        user: The user whose cart is updated.
+        deltas: A dict mapping product ids to the quantity change to apply,
+                or to None to remove the product from the cart.
+
+    Returns:
+        A dict with the following keys:
+            - lines: The changed lines, each with prod_id, quantity and line_total
+                     (a quantity of 0 means the line was removed).
+            - amount: The total amount of the products in the cart (before adding shipping cost).
+            - totalamount: The total amount of the products in the cart (including shipping cost).
+
+    """
+    with transaction.atomic():
+        for product_id, delta in deltas.items():
+            lines = Cart.objects.filter(user=user, product_id=product_id)
+            if delta is None:
+                lines.delete()
+            elif delta:
+                lines.update(quantity=Greatest(F('quantity') + delta, 0))
+        Cart.objects.filter(user=user, product_id__in=deltas, quantity=0).delete()
+        changed = {item.product_id: item for item in priced_lines(user).filter(product_id__in=deltas)}
+    invalidate_cart_summary(user.pk)
+    lines = []
+    for product_id in deltas:
+        item = changed.get(product_id)
+        lines.append({
+            'prod_id': product_id,
+            'quantity': item.quantity if item else 0,
+            'line_total': item.line_total if item else 0,
+        })
+    amount, totalamount = cart_totals(user)
+    return {'lines': lines, 'amount': amount, 'totalamount': totalamount}
+
+
+def cart_summary_key(user_id):
+    """
+    Builds the cache key holding a user's cart summary.
+
+    Args:
+        user_id: The primary key of the user.
+
+    Returns:
+        The cache key for the user's cart summary.
+
+    """
+    return CART_SUMMARY_KEY.format(user_id)
+
+
+def get_cart_summary(user):
+    """
+    Returns the number of cart lines and the subtotal for a user.
+
+    The summary is read from the cache and only recomputed, in a single
+    aggregate query, when the cart has changed since it was last cached.
+    It is always computed on the primary, as a summary read from a lagging
+    replica would stay cached after the client is pinned to the primary.
+
+    Args:
+        user: The user whose cart is summarised.
+
+    Returns:
+        A dict with the following keys:
+            - count: The number of items in the user's cart.
+            - subtotal: The total amount of the products in the cart (before adding shipping cost).
+
+    """
+    key = cart_summary_key(user.pk)
+    summary = cache.get(key)
+    if summary is None:
+        summary = Cart.objects.using(DEFAULT_DB_ALIAS).filter(user=user).aggregate(**_summary_aggregates())
+        cache.set(key, summary, CART_SUMMARY_TIMEOUT)
+    return summary
+
+
+async def aget_cart_summary(user):
+    """
+    Async version of get_cart_summary, using the async cache and ORM APIs.
+
+    """
+    key = cart_summary_key(user.pk)
+    summary = await cache.aget(key)
+    if summary is None:
+        summary = await Cart.objects.using(DEFAULT_DB_ALIAS).filter(user=user).aaggregate(**_summary_aggregates())
+        await cache.aset(key, summary, CART_SUMMARY_TIMEOUT)
+    return summary
+
+
+def _summary_aggregates():
+    return {
+        'count': Count('id'),
+        'subtotal': Coalesce(Sum(line_total_expression()), Value(0.0)),
+    }
+
+
+def invalidate_cart_summary(*user_ids):
+    """
+    Drops the cached cart summary of the given users.
+
+    Inside a transaction, the summaries are dropped again once it commits,
+    since a concurrent request may have cached them meanwhile from the
+    data as it was before the commit.
+
+    Args:
+        *user_ids: The primary keys of the users whose cart changed.
+
+    """
+    keys = [cart_summary_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from .models import CATEGORY_CHOICES, Products
+
+CATEGORY_PAGE_SIZE = 24
+CATEGORY_TITLES_KEY = 'category-titles:{}'
+CATEGORY_TITLES_LIMIT = 50
+CATEGORY_TITLES_TIMEOUT = 60 * 60
+
+
+def category_titles(category):
+    """
+    Returns the product titles listed in a category's sidebar.
+
+    The list is cached per category and dropped whenever a product is saved
+    or deleted. It is read from the primary, so a lagging replica cannot
+    put titles in the cache that the invalidation already dropped.
+
+    Args:
+        category: The category code, e.g. 'CR'.
+
+    Returns:
+        A list of dicts with a 'title' key, in alphabetical order and capped at CATEGORY_TITLES_LIMIT.
+
+    """
+    key = CATEGORY_TITLES_KEY.format(category)
+    titles = cache.get(key)
+    if titles is None:
+        titles = list(_titles_queryset(category))
+        cache.set(key, titles, CATEGORY_TITLES_TIMEOUT)
+    return titles
+
+
+async def acategory_titles(category):
+    """
+    Async version of category_titles, using the async cache and ORM APIs.
+
+    """
+    key = CATEGORY_TITLES_KEY.format(category)
+    titles = await cache.aget(key)
+    if titles is None:
+        titles = [row async for row in _titles_queryset(category)]
+        await cache.aset(key, titles, CATEGORY_TITLES_TIMEOUT)
+    return titles
+
+
+def _titles_queryset(category):
+    return Products.objects.using(DEFAULT_DB_ALIAS).filter(category=category).order_by('title').values('title')[:CATEGORY_TITLES_LIMIT]
+
+
+def invalidate_category_titles():
+    """
+    Drops the cached sidebar titles of every category.
+
+    All categories are dropped because a saved product may have moved out
+    of a category we no longer know about. Inside a transaction, they are
+    dropped again once it commits, like the cart summaries.
+
+    """
+    keys = [CATEGORY_TITLES_KEY.format(code) for code, name in CATEGORY_CHOICES]
+    cache.delete_many(keys)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.delete_many(keys))
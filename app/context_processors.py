@@ -0,0 +1,22 @@
+from .cart import get_cart_summary
+
+
+def cart_summary(request):
+    """
+    Adds the cart badge count to every template context.
+
+    Args:
+        request: The HTTP request object.
+
+    Returns:
+        A dict with the following context variables:
+            - totalitem: The total number of items in the user's cart, if the user is authenticated.
+
+    """
+    totalitem = 0
+    if hasattr(request, 'cart_summary'):
+        # Already fetched by an async view, which cannot query synchronously here.
+        totalitem = request.cart_summary['count']
+    elif request.user.is_authenticated:
+        totalitem = get_cart_summary(request.user)['count']
+    return {'totalitem': totalitem}
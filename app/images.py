@@ -0,0 +1,124 @@
+import logging
+import posixpath
+from io import BytesIO
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_WIDTHS = (100, 300, 600)
+# Width of the JPEG used as src by browsers without srcset support.
+FALLBACK_WIDTH = 300
+# Extension -> Pillow format of each derivative, preferred format first.
+THUMBNAIL_FORMATS = {
+    'webp': 'WEBP',
+    'jpg': 'JPEG',
+}
+THUMBNAIL_QUALITY = 80
+DERIVATIVES_DIR = 'derivatives'
+
+
+def derivative_name(image_name, width, ext):
+    """
+    Returns the storage name of one derivative of an image.
+
+    Args:
+        image_name: The storage name of the original, e.g. 'product/k1.png'.
+        width: The width of the derivative in pixels.
+        ext: The extension of the derivative, 'webp' or 'jpg'.
+
+    Returns:
+        The derivative name, e.g. 'product/derivatives/k1.png-300.webp'. The
+        original extension is kept, so k1.png and k1.jpg get distinct derivatives.
+
+    """
+    folder, filename = posixpath.split(image_name)
+    return posixpath.join(folder, DERIVATIVES_DIR, f'{filename}-{width}.{ext}')
+
+
+def _encode(image, width, fmt):
+    copy = image.copy()
+    copy.thumbnail((width, width * 10), Image.LANCZOS)
+    if fmt == 'JPEG' and copy.mode != 'RGB':
+        background = Image.new('RGB', copy.size, (255, 255, 255))
+        rgba = copy.convert('RGBA')
+        background.paste(rgba, mask=rgba.split()[-1])
+        copy = background
+    buffer = BytesIO()
+    copy.save(buffer, fmt, quality=THUMBNAIL_QUALITY, optimize=True)
+    return ContentFile(buffer.getvalue())
+
+
+def generate_derivatives(image_field, overwrite=False):
+    """
+    Generates the fixed-width WebP and JPEG derivatives of an image.
+
+    Derivatives that already exist are kept unless overwrite is set, and
+    images are never upscaled.
+
+    Args:
+        image_field: The ImageFieldFile of the original, e.g. product.product_image.
+        overwrite: Whether to regenerate existing derivatives.
+
+    Returns:
+        The list of derivative names written, empty if the original cannot be read.
+
+    """
+    if not image_field:
+        return []
+    pending = [
+        (width, ext, fmt, derivative_name(image_field.name, width, ext))
+        for width in THUMBNAIL_WIDTHS
+        for ext, fmt in THUMBNAIL_FORMATS.items()
+    ]
+    if not overwrite:
+        pending = [item for item in pending if not default_storage.exists(item[3])]
+    if not pending:
+        return []
+    try:
+        with image_field.storage.open(image_field.name, 'rb') as original:
+            image = Image.open(original)
+            image.load()
+    except FileNotFoundError:
+        logger.info('Cannot create thumbnails of missing image %s', image_field.name)
+        return []
+    except (OSError, ValueError):
+        logger.warning('Cannot create thumbnails of %s', image_field.name, exc_info=True)
+        return []
+    written = []
+    for width, ext, fmt, name in pending:
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        written.append(default_storage.save(name, _encode(image, width, fmt)))
+    return written
+
+
+def derivative_url(image_name, width, ext):
+    """
+    Returns the URL of one derivative of an image.
+
+    """
+    return default_storage.url(derivative_name(image_name, width, ext))
+
+
+def derivative_srcsets(image_name):
+    """
+    Returns the srcset of each derivative format of an image.
+
+    Args:
+        image_name: The storage name of the original.
+
+    Returns:
+        A dict mapping each extension to a srcset string, or an empty dict if
+        the derivatives have not been generated yet.
+
+    """
+    if not default_storage.exists(derivative_name(image_name, THUMBNAIL_WIDTHS[-1], 'jpg')):
+        return {}
+    return {
+        ext: ', '.join(
+            f'{derivative_url(image_name, width, ext)} {width}w' for width in THUMBNAIL_WIDTHS
+        )
+        for ext in THUMBNAIL_FORMATS
+    }
@@ -0,0 +1,171 @@
+import time
+import uuid
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+from django.test import Client
+from django.urls import reverse
+from .cart import cart_totals
+from .models import Payment
+from .queries import QueryRecorder
+
+# Scripted shopper journeys replayed by `manage.py benchmark_journeys`,
+# either in-process through the Django test client or over HTTP against a
+# running server.
+
+
+class JourneyError(Exception):
+    pass
+
+
+class InProcessClient:
+    """
+    Sends requests through the Django test client, counting their queries.
+
+    """
+    def __init__(self):
+        self.client = Client()
+
+    def request(self, method, path, data=None):
+        """
+        Sends one request.
+
+        Args:
+            method: 'get' or 'post'.
+            path: The path, with its query string.
+            data: The form data of a POST request.
+
+        Returns:
+            A tuple of (status code, latency in seconds, number of queries).
+
+        """
+        with QueryRecorder() as recorder:
+            start = time.perf_counter()
+            response = getattr(self.client, method)(path, data)
+            latency = time.perf_counter() - start
+        return response.status_code, latency, recorder.count
+
+
+class _NoRedirect(HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class LiveClient:
+    """
+    Sends requests to a running server over HTTP, keeping its cookies.
+
+    Query counts are read from the X-DB-Queries header, which the server only
+    sends when it runs with QUERY_INSPECTION=1.
+
+    """
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies), _NoRedirect())
+
+    def _csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return None
+
+    def request(self, method, path, data=None):
+        url = self.base_url + path
+        body = urlencode(data or {}).encode() if method == 'post' else None
+        if method == 'post' and self._csrf_token() is None:
+            # Fetch the page once to receive the CSRF cookie.
+            self.request('get', path)
+        request = Request(url, data=body, method=method.upper())
+        if method == 'post':
+            request.add_header('X-CSRFToken', self._csrf_token() or '')
+            request.add_header('Referer', url)
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request) as response:
+                response.read()
+                status, headers = response.status, response.headers
+        except HTTPError as e:
+            e.read()
+            status, headers = e.code, e.headers
+        latency = time.perf_counter() - start
+        queries = headers.get('X-DB-Queries')
+        return status, latency, int(queries) if queries is not None else None
+
+
+def _step(client, results, name, method='get', args=(), query=None, data=None, expect=(200,)):
+    path = reverse(name, args=args)
+    if query:
+        path += '?' + urlencode(query)
+    status, latency, queries = client.request(method, path, data)
+    if status not in expect:
+        raise JourneyError(f'{method.upper()} {path} ({name}) returned {status}')
+    results.record(name, latency, queries)
+
+
+def shopper_journey(client, results, shopper, product, create_payment=None):
+    """
+    Replays a shopper reading the about page, logging in, browsing to a
+    product, adjusting the cart, checking out and reviewing the orders.
+
+    Args:
+        client: An InProcessClient or LiveClient.
+        results: The BenchmarkResults to record the requests in.
+        shopper: A dict with the username, password and customer_id of the shopper.
+        product: A dict with the id and category of the product bought.
+        create_payment: A callable returning the razorpay order id of a new
+                        pending payment, or None to stop at the checkout page.
+
+    """
+    _step(client, results, 'about')
+    _step(client, results, 'login', 'post',
+          data={'username': shopper['username'], 'password': shopper['password']}, expect=(302,))
+    _step(client, results, 'home')
+    _step(client, results, 'category', args=[product['category']])
+    _step(client, results, 'product-detail', args=[product['id']])
+    _step(client, results, 'add-to-cart', query={'prod_id': product['id']}, expect=(302,))
+    _step(client, results, 'showcart')
+    _step(client, results, 'pluscart', query={'prod_id': product['id']})
+    _step(client, results, 'minuscart', query={'prod_id': product['id']})
+    _step(client, results, 'checkout')
+    if create_payment is not None:
+        _step(client, results, 'paymentdone', query={
+            'order_id': create_payment(), 'payment_id': f'pay_{uuid.uuid4().hex}',
+            'cust_id': shopper['customer_id'],
+        }, expect=(302,))
+    _step(client, results, 'orders')
+    _step(client, results, 'logout', 'post', expect=(302,))
+
+
+def search_journey(client, results, shopper, product):
+    """
+    Replays a shopper logging in and searching for a product.
+
+    Args:
+        client: An InProcessClient or LiveClient.
+        results: The BenchmarkResults to record the requests in.
+        shopper: A dict with the username and password of the shopper.
+        product: A dict with the title of the product searched for.
+
+    """
+    term = product['title'].split()[0]
+    _step(client, results, 'login', 'post',
+          data={'username': shopper['username'], 'password': shopper['password']}, expect=(302,))
+    _step(client, results, 'search-suggest', query={'q': term[:3]})
+    _step(client, results, 'search', query={'search': term})
+    _step(client, results, 'logout', 'post', expect=(302,))
+
+
+def new_payment_factory(user):
+    """
+    Returns a callable creating a pending payment of the user for the
+    current cart total, standing in for the payment gateway in in-process runs.
+
+    """
+    def create_payment():
+        order_id = f'order_{uuid.uuid4().hex}'
+        Payment.objects.create(user=user, amount=cart_totals(user)[1], razorpay_order_id=order_id)
+        return order_id
+
+    return create_payment
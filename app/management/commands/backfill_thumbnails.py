@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from app.images import generate_derivatives
+from app.models import Products
+
+
+class Command(BaseCommand):
+    help = 'Generates the WebP and JPEG thumbnails of existing product images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--overwrite', action='store_true',
+                            help='Regenerate thumbnails that already exist.')
+
+    def handle(self, *args, **options):
+        products = Products.objects.exclude(product_image='').only('id', 'product_image')
+        images = files = 0
+        for product in products.iterator():
+            written = generate_derivatives(product.product_image, overwrite=options['overwrite'])
+            if written:
+                images += 1
+                files += len(written)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {files} thumbnails for {images} product images.'))
@@ -0,0 +1,107 @@
+import importlib.util
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.utils import ConnectionHandler
+from app.benchmark import summarize
+
+MODES = ('new', 'persistent', 'pool')
+
+
+def variant_settings(base, mode, pool_size):
+    """
+    Returns a copy of a DATABASES entry configured for a connection mode.
+
+    Args:
+        base: The DATABASES entry to start from.
+        mode: 'new', 'persistent' or 'pool'.
+        pool_size: The maximum size of the pool in 'pool' mode.
+
+    Returns:
+        The new DATABASES entry.
+
+    """
+    config = {key: value for key, value in base.items() if key not in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS')}
+    options = {key: value for key, value in base.get('OPTIONS', {}).items() if key != 'pool'}
+    if mode == 'persistent':
+        config['CONN_MAX_AGE'] = None
+        config['CONN_HEALTH_CHECKS'] = True
+    elif mode == 'pool':
+        options['pool'] = {'min_size': 1, 'max_size': pool_size, 'timeout': 10}
+    config['OPTIONS'] = options
+    return config
+
+
+def pool_supported(config):
+    return (
+        config['ENGINE'] == 'django.db.backends.postgresql'
+        and importlib.util.find_spec('psycopg_pool') is not None
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Simulates requests that each run one query, opening a new connection per request, '
+        'reusing persistent connections, or borrowing from a psycopg pool, and reports the '
+        'per-request latency of each mode.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Requests per mode.')
+        parser.add_argument('--concurrency', type=int, default=4, help='Number of worker threads.')
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES), help='Modes to compare.')
+        parser.add_argument('--query', default='SELECT 1', help='The query each request runs.')
+
+    def handle(self, *args, **options):
+        base = settings.DATABASES['default']
+        for mode in options['modes']:
+            config = variant_settings(base, mode, options['concurrency'])
+            if mode == 'pool' and not pool_supported(config):
+                self.stdout.write('pool: skipped, it needs PostgreSQL and the psycopg_pool package')
+                continue
+            latencies, elapsed = self.run(mode, base, config, options)
+            stats = summarize(latencies, elapsed)
+            self.stdout.write(
+                f"{mode}: {stats['requests']} requests, {stats['throughput']:.1f} req/s, "
+                f"p50 {stats['p50_ms']:.2f} ms, p95 {stats['p95_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms"
+            )
+
+    def run(self, mode, base, config, options):
+        # ConnectionHandler requires a 'default' alias; the distinct benchmark
+        # alias also keeps the pool apart from the one of 'default'.
+        alias = f'benchmark-{mode}'
+        connections = ConnectionHandler({'default': base, alias: config})
+        opened = []
+        lock = threading.Lock()
+
+        def request(_):
+            connection = connections[alias]
+            with lock:
+                if connection not in opened:
+                    # Lets the main thread close it once the workers are done.
+                    connection.inc_thread_sharing()
+                    opened.append(connection)
+            # What the request_started and request_finished signals do.
+            start = time.perf_counter()
+            connection.close_if_unusable_or_obsolete()
+            with connection.cursor() as cursor:
+                cursor.execute(options['query'])
+                cursor.fetchall()
+            connection.close_if_unusable_or_obsolete()
+            return time.perf_counter() - start
+
+        try:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(options['concurrency']) as executor:
+                latencies = list(executor.map(request, range(options['requests'])))
+            elapsed = time.perf_counter() - start
+        except Exception as e:
+            raise CommandError(f'{mode}: {e}')
+        finally:
+            for connection in opened:
+                connection.close()
+            if mode == 'pool' and opened:
+                opened[0].close_pool()
+        return latencies, elapsed
@@ -0,0 +1,153 @@
+import json
+import subprocess
+from itertools import cycle
+from urllib.request import urlopen
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import setup_databases, teardown_databases
+from app.benchmark import BenchmarkResults, compare
+from app.journeys import (
+    InProcessClient, JourneyError, LiveClient, new_payment_factory, search_journey, shopper_journey,
+)
+from app.models import CATEGORY_CHOICES, Customer, Products
+from app.search import update_search_vector
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+
+class Command(BaseCommand):
+    help = (
+        'Replays scripted shopper journeys (login, browse, cart, checkout, orders, search) and '
+        'reports latency percentiles, throughput and query counts per URL name. By default it '
+        'runs in-process on a throwaway test database seeded with a catalog.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20,
+                            help='Number of times each journey is replayed.')
+        parser.add_argument('--products', type=int, default=200,
+                            help='Number of products seeded for in-process runs.')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+        parser.add_argument('--compare', help='A previous JSON results file to compare against.')
+        parser.add_argument('--keepdb', action='store_true', help='Reuse the test database between runs.')
+        parser.add_argument('--live-url',
+                            help='Drive a running server at this URL instead, e.g. http://127.0.0.1:8000.')
+        parser.add_argument('--username', help='The shopper account used with --live-url.')
+        parser.add_argument('--password', help='The password of that account.')
+
+    def handle(self, *args, **options):
+        if options['live_url']:
+            results = self.run_live(options)
+        else:
+            results = self.run_in_process(options)
+        report = results.report()
+        report['meta'] = {
+            'mode': 'live' if options['live_url'] else 'in-process',
+            'database': connection.vendor,
+            'server_mode': settings.SERVER_MODE,
+            'session_mode': settings.SESSION_MODE,
+            'iterations': options['iterations'],
+            'commit': self.git_commit(),
+        }
+        self.print_report(report)
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.print_comparison(compare(json.load(f), report))
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+                f.write('\n')
+
+    def run_in_process(self, options):
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+        try:
+            # The test client sends requests for the host 'testserver'.
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                user, shopper, products = self.seed(options['products'])
+                create_payment = new_payment_factory(user)
+                results = BenchmarkResults()
+                self.replay(InProcessClient, results, shopper, products, options['iterations'], create_payment)
+                results.finish()
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+        return results
+
+    def run_live(self, options):
+        if not options['username'] or not options['password']:
+            raise CommandError('--live-url requires --username and --password.')
+        base_url = options['live_url'].rstrip('/')
+        with urlopen(f'{base_url}/vendor/products/?fields=id,title,category&page_size=100') as response:
+            products = json.load(response)['results']
+        if not products:
+            raise CommandError(f'{base_url} has no products.')
+        shopper = {'username': options['username'], 'password': options['password']}
+        results = BenchmarkResults()
+        self.replay(lambda: LiveClient(base_url), results, shopper, products, options['iterations'])
+        results.finish()
+        return results
+
+    def replay(self, make_client, results, shopper, products, iterations, create_payment=None):
+        products = cycle(products)
+        try:
+            for _ in range(iterations):
+                product = next(products)
+                shopper_journey(make_client(), results, shopper, product, create_payment)
+                search_journey(make_client(), results, shopper, product)
+        except JourneyError as e:
+            raise CommandError(e)
+
+    def seed(self, count):
+        """
+        Creates the benchmark shopper, an address and a catalog spread over
+        every category.
+
+        """
+        user = User.objects.create_user('benchmark-shopper', password=BENCHMARK_PASSWORD)
+        customer = Customer.objects.create(
+            User=user, name='Benchmark Shopper', locality='Main Road', city='Polokwane',
+            mobile=0, zipcode=700, state='PLK',
+        )
+        codes = sorted(code for code, name in CATEGORY_CHOICES)
+        created = Products.objects.bulk_create(
+            Products(
+                title=f'Aloe {codes[i % len(codes)]} {i}', selling_price=120, discounted_price=100,
+                description='Soothing aloe care', category=codes[i % len(codes)],
+                product_image='product/benchmark.png',
+            )
+            for i in range(count)
+        )
+        update_search_vector(*[product.pk for product in created])
+        shopper = {'username': user.username, 'password': BENCHMARK_PASSWORD, 'customer_id': customer.pk}
+        products = [{'id': p.pk, 'title': p.title, 'category': p.category} for p in created]
+        return user, shopper, products
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                cwd=settings.BASE_DIR,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def print_report(self, report):
+        overall = report['overall']
+        self.stdout.write(
+            f"{overall['requests']} requests, {overall['throughput']:.1f} req/s, "
+            f"p50 {overall['p50_ms']:.1f} ms, p95 {overall['p95_ms']:.1f} ms, p99 {overall['p99_ms']:.1f} ms"
+        )
+        self.stdout.write(f"{'url name':<16}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}")
+        for name, stats in report['urls'].items():
+            queries = '-' if stats['queries_mean'] is None else f"{stats['queries_mean']:.1f}"
+            self.stdout.write(
+                f"{name:<16}{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}{queries:>9}"
+            )
+
+    def print_comparison(self, changes):
+        self.stdout.write('Change against the previous results:')
+        for name, p95, queries in changes:
+            queries = '' if queries is None else f', queries {queries:+.1f}'
+            self.stdout.write(f'{name:<16} p95 {p95:+.1f}%{queries}')
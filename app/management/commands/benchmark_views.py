@@ -0,0 +1,92 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+from app.benchmark import summarize
+from app.models import Products
+
+
+class Command(BaseCommand):
+    help = (
+        'Loads the catalog and cart pages concurrently in-process and reports throughput and '
+        'latency percentiles. Run once with SERVER_MODE=wsgi and once with SERVER_MODE=asgi to '
+        'compare the sync and async views.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Total number of requests.')
+        parser.add_argument('--concurrency', type=int, default=16, help='Number of requests in flight.')
+
+    def handle(self, *args, **options):
+        product = Products.objects.order_by('id').first()
+        if product is None:
+            raise CommandError('There are no products to load; import some first.')
+        urls = [
+            reverse('home'),
+            reverse('category', args=[product.category]),
+            reverse('product-detail', args=[product.pk]),
+            reverse('search') + f'?search={product.title.split()[0]}',
+            reverse('showcart'),
+        ]
+        urls = list(islice(cycle(urls), options['requests']))
+        user = User.objects.create_user('views-benchmark')
+        # The test clients send requests for the host 'testserver'.
+        allow_test_host = override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'])
+        try:
+            allow_test_host.enable()
+            if settings.ASYNC_VIEWS:
+                mode = 'asgi'
+                latencies, elapsed = asyncio.run(self.run_asgi(user, urls, options['concurrency']))
+            else:
+                mode = 'wsgi'
+                latencies, elapsed = self.run_wsgi(user, urls, options['concurrency'])
+        finally:
+            allow_test_host.disable()
+            user.delete()
+        stats = summarize(latencies, elapsed)
+        self.stdout.write(
+            f"{mode}: {stats['requests']} requests, {stats['throughput']:.1f} req/s, "
+            f"p50 {stats['p50_ms']:.1f} ms, p95 {stats['p95_ms']:.1f} ms, p99 {stats['p99_ms']:.1f} ms"
+        )
+
+    def run_wsgi(self, user, urls, concurrency):
+        local = threading.local()
+
+        def fetch(url):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+                local.client.force_login(user)
+            start = time.perf_counter()
+            response = local.client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f'{url} returned {response.status_code}')
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            latencies = list(pool.map(fetch, urls))
+        return latencies, time.perf_counter() - start
+
+    async def run_asgi(self, user, urls, concurrency):
+        client = AsyncClient()
+        await client.aforce_login(user)
+        queue = iter(urls)
+        latencies = []
+
+        async def worker():
+            for url in queue:
+                start = time.perf_counter()
+                response = await client.get(url)
+                if response.status_code != 200:
+                    raise CommandError(f'{url} returned {response.status_code}')
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return latencies, time.perf_counter() - start
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from app.models import Products
+from app.product_io import EXPORT_CHUNK_SIZE, FORMATS, Progress, export_products, guess_format
+
+
+class Command(BaseCommand):
+    help = 'Writes the products to a CSV or JSON Lines file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="The file to write, or '-' for stdout.")
+        parser.add_argument('--format', choices=FORMATS,
+                            help='The file format; guessed from the extension by default.')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                            help='Number of rows fetched from the database at a time.')
+        parser.add_argument('--category', help='Only export the products of this category code.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            fmt = guess_format(path, options['format'])
+        except ValueError as e:
+            raise CommandError(e)
+        queryset = Products.objects.all()
+        if options['category']:
+            queryset = queryset.filter(category=options['category'])
+        progress = Progress(self.stderr.write if options['verbosity'] > 0 else None)
+        stream = self.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        try:
+            count = export_products(
+                stream, fmt, chunk_size=options['chunk_size'], queryset=queryset, progress=progress,
+            )
+        finally:
+            if stream is not self.stdout:
+                stream.close()
+        if stream is not self.stdout:
+            self.stdout.write(self.style.SUCCESS(f'Exported {count} products ({progress.rate:.0f} rows/s).'))
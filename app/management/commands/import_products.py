@@ -0,0 +1,44 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from app.product_io import FORMATS, IMPORT_CHUNK_SIZE, Progress, guess_format, import_products, read_rows
+
+# Number of skipped rows listed individually.
+MAX_REPORTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = 'Creates or updates products from a CSV or JSON Lines file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="The file to import, or '-' for stdin.")
+        parser.add_argument('--format', choices=FORMATS,
+                            help='The file format; guessed from the extension by default.')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE,
+                            help='Number of products written per bulk query.')
+        parser.add_argument('--images',
+                            help='Directory holding the image files named by the image column.')
+        parser.add_argument('--skip-thumbnails', action='store_true',
+                            help='Leave thumbnail generation to backfill_thumbnails.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            fmt = guess_format(path, options['format'])
+        except ValueError as e:
+            raise CommandError(e)
+        progress = Progress(self.stderr.write if options['verbosity'] > 0 else None)
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            stats = import_products(
+                read_rows(stream, fmt), chunk_size=options['chunk_size'], image_dir=options['images'],
+                make_thumbnails=not options['skip_thumbnails'], progress=progress,
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        for number, message in stats['errors'][:MAX_REPORTED_ERRORS]:
+            self.stderr.write(f'Row {number} skipped: {message}')
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {stats['created']} and updated {stats['updated']} products "
+            f"({progress.rate:.0f} rows/s), skipped {len(stats['errors'])} rows."
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from app.reports import REBUILD_BATCH_SIZE, rebuild_sales_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the daily sales rollups from the placed order lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=REBUILD_BATCH_SIZE,
+                            help='Number of rollup rows inserted per query.')
+
+    def handle(self, *args, **options):
+        count = rebuild_sales_rollups(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} daily sales rollups.'))
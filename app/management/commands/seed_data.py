@@ -0,0 +1,42 @@
+import time
+from datetime import datetime, time as dt_time, timezone
+from django.core.management.base import BaseCommand, CommandError
+from app.seed import SEED_CHUNK_SIZE, SEED_EPOCH, SEED_PASSWORD, seed_data
+
+
+class Command(BaseCommand):
+    help = 'Fills the database with deterministic synthetic products, shoppers, carts and orders for load testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='The random seed.')
+        parser.add_argument('--products', type=int, default=1000, help='Number of products.')
+        parser.add_argument('--users', type=int, default=200, help='Number of users, each with an address.')
+        parser.add_argument('--order-lines', type=int, default=10000, help='Number of order lines.')
+        parser.add_argument('--chunk-size', type=int, default=SEED_CHUNK_SIZE,
+                            help='Number of rows inserted per query.')
+        parser.add_argument('--epoch', type=self.parse_date, default=SEED_EPOCH,
+                            help=f'The date (YYYY-MM-DD) the order history ends, {SEED_EPOCH.date()} by default.')
+
+    def parse_date(self, value):
+        return datetime.combine(datetime.strptime(value, '%Y-%m-%d').date(), dt_time(), timezone.utc)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        def progress(label, count):
+            if options['verbosity'] > 1:
+                self.stderr.write(f'{count} {label} ({time.monotonic() - started:.1f} s)')
+
+        try:
+            counts = seed_data(
+                seed=options['seed'], products=options['products'], users=options['users'],
+                order_lines=options['order_lines'], chunk_size=options['chunk_size'], progress=progress,
+                epoch=options['epoch'],
+            )
+        except ValueError as e:
+            raise CommandError(e)
+        summary = ', '.join(f'{count} {label}' for label, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {summary} in {time.monotonic() - started:.1f} s. '
+            f"Seeded users log in as seed{options['seed']}-<n> with password {SEED_PASSWORD}."
+        ))
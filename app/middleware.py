@@ -0,0 +1,231 @@
+import logging
+import mimetypes
+import os
+import re
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware as BaseSessionMiddleware
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+from .queries import QueryRecorder
+from .routers import RoutingState, pin_response, pinned_until, routing_state
+from .sessions import SessionFreeStore, drop_session, is_session_free
+
+query_logger = logging.getLogger('app.queries')
+
+# Names produced by ManifestStaticFilesStorage, e.g. css/style.3e2f1a9b8c7d.css
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+# Precompressed variants written by app.storage, in order of preference.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class StaticAssetMiddleware:
+    """
+    Serves the collected static files from STATIC_ROOT without a separate
+    web server.
+
+    Content-hashed files are sent with a far-future immutable Cache-Control,
+    other files must be revalidated (answered with 304 when unchanged), and
+    the brotli or gzip variant is chosen from the request's Accept-Encoding.
+    Disabled when DEBUG is on, where runserver serves the app static
+    directories directly. Supports both WSGI and ASGI without switching
+    threads.
+
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.DEBUG or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+        self.root = str(settings.STATIC_ROOT)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.process(request)
+        if response is None:
+            response = self.get_response(request)
+        return response
+
+    async def __acall__(self, request):
+        response = self.process(request)
+        if response is None:
+            response = await self.get_response(request)
+        return response
+
+    def process(self, request):
+        """
+        Returns the response for a collected static file, or None to pass the
+        request on.
+
+        """
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefix):
+            return self.serve(request, request.path_info[len(self.prefix):])
+        return None
+
+    def serve(self, request, name):
+        """
+        Builds the response for one static file.
+
+        Args:
+            request: The HTTP request object.
+            name: The path of the file relative to STATIC_ROOT.
+
+        Returns:
+            The file response, a 304 response, or None if the file was not collected.
+
+        """
+        try:
+            path = safe_join(self.root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+        mtime = os.stat(path).st_mtime
+        cache_control = IMMUTABLE_CACHE_CONTROL if HASHED_NAME_RE.search(name) else REVALIDATE_CACHE_CONTROL
+        if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), mtime):
+            response = HttpResponseNotModified()
+        else:
+            accepted = request.META.get('HTTP_ACCEPT_ENCODING', '')
+            served, encoding = path, None
+            for candidate, suffix in ENCODINGS:
+                if candidate in accepted and os.path.isfile(path + suffix):
+                    served, encoding = path + suffix, candidate
+                    break
+            content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            response = FileResponse(open(served, 'rb'), content_type=content_type)
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['Last-Modified'] = http_date(mtime)
+        response['Cache-Control'] = cache_control
+        response['Vary'] = 'Accept-Encoding'
+        return response
+
+
+class QueryInspectionMiddleware:
+    """
+    Reports the database work done by each request.
+
+    Adds the query count and total query time as X-DB-Queries and
+    Server-Timing headers, and logs a warning naming the view (its URL name
+    from app/urls.py) when a request runs more than QUERY_BUDGET queries,
+    together with the statements repeated often enough to be N+1 loops.
+    Only active when settings.QUERY_INSPECTION is on.
+
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSPECTION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        self.report(request, response, recorder)
+        return response
+
+    async def __acall__(self, request):
+        with QueryRecorder() as recorder:
+            response = await self.get_response(request)
+        self.report(request, response, recorder)
+        return response
+
+    def report(self, request, response, recorder):
+        """
+        Adds the query headers to the response and logs requests over budget.
+
+        Args:
+            request: The HTTP request object.
+            response: The response of the view.
+            recorder: The QueryRecorder active during the request.
+
+        """
+        duration_ms = recorder.duration * 1000
+        response['X-DB-Queries'] = str(recorder.count)
+        response['Server-Timing'] = f'db;dur={duration_ms:.1f};desc="{recorder.count} queries"'
+        if recorder.count <= settings.QUERY_BUDGET:
+            return
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        repeated = ''.join(f'\n  {n} x {sql}' for sql, n in recorder.repeated())
+        query_logger.warning(
+            '%s %s (%s) ran %d queries in %.1f ms, over the budget of %d.%s',
+            request.method, request.path, view_name, recorder.count, duration_ms,
+            settings.QUERY_BUDGET, repeated and f'\nRepeated statements:{repeated}',
+        )
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Tracks how each request may read from the database for the ReplicaRouter.
+
+    Reads of the replica views (see app.routers) go to a replica, unless
+    the client is pinned to the primary by a write in one of its recent
+    requests. A request that writes pins its client for
+    REPLICA_PIN_SECONDS. Only active when settings.DATABASE_REPLICAS is set.
+
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with routing_state(self.start(request)) as state:
+            response = self.get_response(request)
+        return self.finish(response, state)
+
+    async def __acall__(self, request):
+        with routing_state(self.start(request)) as state:
+            response = await self.get_response(request)
+        return self.finish(response, state)
+
+    def start(self, request):
+        return RoutingState(request, pinned=pinned_until(request) > time.time())
+
+    def finish(self, response, state):
+        if state.wrote:
+            pin_response(response)
+        return response
+
+
+class SessionMiddleware(BaseSessionMiddleware):
+    """
+    Django's SessionMiddleware, except that GET and HEAD requests to views
+    marked with app.sessions.session_free never touch the session: they run
+    no session query and their responses set no session cookie.
+
+    """
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if is_session_free(request, view_func):
+            drop_session(request)
+
+    def process_response(self, request, response):
+        if isinstance(getattr(request, 'session', None), SessionFreeStore):
+            return response
+        return super().process_response(request, response)
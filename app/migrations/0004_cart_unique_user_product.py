@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_cart_lines(apps, schema_editor):
+    """
+    Folds duplicate (user, product) cart lines into the oldest one, summing
+    their quantities, so the unique constraint can be added.
+
+    """
+    Cart = apps.get_model('app', 'Cart')
+    duplicates = (
+        Cart.objects.values('user_id', 'product_id')
+        .annotate(lines=Count('id'), total=Sum('quantity'), keep=Min('id'))
+        .filter(lines__gt=1)
+    )
+    for dup in list(duplicates):
+        lines = Cart.objects.filter(user_id=dup['user_id'], product_id=dup['product_id'])
+        lines.exclude(pk=dup['keep']).delete()
+        lines.filter(pk=dup['keep']).update(quantity=dup['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('app', '0003_alter_customer_state_alter_orderplaced_status_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_cart_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(fields=('user', 'product'), name='unique_cart_user_product'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+# GIN indexes are PostgreSQL-only, so they are created here rather than in
+# Products.Meta.indexes, which would also be applied to SQLite.
+CREATE_SEARCH_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS app_products_search_vector_gin ON app_products USING gin (search_vector)',
+    'CREATE INDEX IF NOT EXISTS app_products_title_trgm ON app_products USING gin (title gin_trgm_ops)',
+]
+DROP_SEARCH_INDEXES = [
+    'DROP INDEX IF EXISTS app_products_search_vector_gin',
+    'DROP INDEX IF EXISTS app_products_title_trgm',
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in CREATE_SEARCH_INDEXES:
+        schema_editor.execute(sql)
+    Products = apps.get_model('app', 'Products')
+    Products.objects.update(search_vector=(
+        SearchVector('title', weight='A', config='english')
+        + SearchVector('description', weight='B', config='english')
+        + SearchVector('composition', 'prodapp', weight='C', config='english')
+    ))
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in DROP_SEARCH_INDEXES:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_cart_unique_user_product'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='products',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
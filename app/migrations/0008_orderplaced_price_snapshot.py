@@ -0,0 +1,43 @@
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F, FloatField, OuterRef, Subquery
+
+
+def snapshot_existing_prices(apps, schema_editor):
+    """
+    Backfills the price snapshot of existing order lines. The price paid was
+    never recorded, so the product's current discounted price is the best
+    available value.
+
+    """
+    OrderPlaced = apps.get_model('app', 'OrderPlaced')
+    Products = apps.get_model('app', 'Products')
+    price = Products.objects.filter(pk=OuterRef('product_id')).values('discounted_price')[:1]
+    OrderPlaced.objects.filter(unit_price__isnull=True).update(unit_price=Subquery(price))
+    OrderPlaced.objects.filter(line_total__isnull=True).update(
+        line_total=ExpressionWrapper(F('quantity') * F('unit_price'), output_field=FloatField()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_products_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderplaced',
+            name='unit_price',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='orderplaced',
+            name='line_total',
+            field=models.FloatField(null=True),
+        ),
+        migrations.RunPython(snapshot_existing_prices, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='orderplaced',
+            index=models.Index(fields=['user', '-ordered_date', '-id'], name='orderplaced_user_date_idx'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Min, Sum
+
+SHIPPING_COST = 40
+STATUSES = ['Accepted', 'Packed', 'On The Way', 'Delivered', 'Cancel', 'Pending']
+
+
+def create_order_headers(apps, schema_editor):
+    """
+    Groups the existing order lines into one Order per payment.
+
+    Line statuses are first normalised to the spelling of STATUS_CHOICES,
+    as lines created without a status got the lowercase default 'pending'.
+
+    """
+    Order = apps.get_model('app', 'Order')
+    OrderPlaced = apps.get_model('app', 'OrderPlaced')
+    for status in STATUSES:
+        OrderPlaced.objects.filter(status__iexact=status).exclude(status=status).update(status=status)
+    groups = (
+        OrderPlaced.objects.filter(order__isnull=True)
+        .values('payment_id')
+        .annotate(item_count=Count('id'), amount=Sum('line_total'), created=Min('ordered_date'), first=Min('id'))
+        .order_by()
+    )
+    for group in list(groups):
+        first = OrderPlaced.objects.get(pk=group['first'])
+        amount = group['amount'] or 0
+        order = Order.objects.create(
+            user_id=first.user_id, customer_id=first.customer_id, payment_id=group['payment_id'],
+            item_count=group['item_count'], amount=amount, shipping=SHIPPING_COST,
+            total=amount + SHIPPING_COST, status=first.status,
+        )
+        Order.objects.filter(pk=order.pk).update(created=group['created'])
+        OrderPlaced.objects.filter(payment_id=group['payment_id']).update(order=order)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('app', '0009_payment_razorpay_order_id_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_count', models.PositiveIntegerField(default=0)),
+                ('amount', models.FloatField(default=0)),
+                ('shipping', models.FloatField(default=0)),
+                ('total', models.FloatField(default=0)),
+                ('status', models.CharField(choices=[('Accepted', 'Accepted'), ('Packed', 'Packed'), ('On The Way', 'On The Way'), ('Delivered', 'Delivered'), ('Cancel', 'Cancel'), ('Pending', 'Pending')], default='Pending', max_length=50)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.customer')),
+                ('payment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='app.payment')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['user', '-created', '-id'], name='order_user_created_idx'),
+                    models.Index(fields=['status'], name='order_status_idx'),
+                ],
+            },
+        ),
+        migrations.AddField(
+            model_name='orderplaced',
+            name='order',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='app.order'),
+        ),
+        migrations.RunPython(create_order_headers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('category', models.CharField(choices=[('CR', 'Cream'), ('MS', 'Moisture'), ('CM', 'Combos'), ('WS', 'Wash'), ('SR', 'Serun'), ('BL', 'Balm')], max_length=2)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.FloatField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.products')),
+            ],
+            options={
+                'constraints': [
+                    models.UniqueConstraint(fields=('day', 'product'), name='unique_salesrollup_day_product'),
+                ],
+                'indexes': [
+                    models.Index(fields=['day', 'category'], name='salesrollup_day_category_idx'),
+                ],
+            },
+        ),
+    ]
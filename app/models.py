@@ -1,5 +1,7 @@
 from django.db import models
+from django.db.models import F
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVectorField
 # Create your models here.
 STATE_CHOICES = {
     ('PLK','Polokwane'),
@@ -42,6 +44,9 @@ class Products(models.Model):
         prodapp (TextField): The application of the product.
         category (CharField): The category of the product.
         product_image (ImageField): The image of the product.
+        search_vector (SearchVectorField): The weighted full-text document of the product, maintained by app.search
+            (PostgreSQL only).
+        version (PositiveIntegerField): Incremented on every save; keys the cached product fragments.
 
     """
     title = models.CharField(max_length=100)
@@ -52,6 +57,14 @@ class Products(models.Model):
     prodapp = models.TextField(default='')
     category = models.CharField(choices=CATEGORY_CHOICES, max_length=2)
     product_image = models.ImageField(upload_to='product')
+    search_vector = SearchVectorField(null=True, editable=False)
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['category', 'id'], name='products_category_id_idx'),
+            models.Index(fields=['title'], name='products_title_idx'),
+        ]
     
     def __str__(self):
         """
@@ -62,6 +75,24 @@ class Products(models.Model):
 
         """
         return self.title
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the product, bumping its version when it already exists so that
+        cached product cards and detail fragments are re-rendered.
+
+        The version is incremented by the database, so concurrent saves of
+        stale copies of a product still produce distinct versions.
+
+        """
+        bump = not self._state.adding
+        if bump:
+            self.version = F('version') + 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        super().save(*args, **kwargs)
+        if bump:
+            self.refresh_from_db(fields=['version'])
     
 class Customer(models.Model):
     """
@@ -108,6 +139,11 @@ class Cart(models.Model):
     product = models.ForeignKey(Products, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='unique_cart_user_product'),
+        ]
+
     @property
     def total_cost(self):
         """
@@ -117,7 +153,8 @@ class Cart(models.Model):
             The total cost of the cart item (quantity * product's discounted price).
 
         """
-        return self.quantity * self.product.discounted_price
+        from .cart import line_total
+        return line_total(self)
     
 class Payment(models.Model):
     """
@@ -126,7 +163,8 @@ class Payment(models.Model):
     Attributes:
         user (ForeignKey): The user associated with the payment.
         amount (FloatField): The amount of the payment.
-        razorpay_order_id (CharField): The order ID provided by Razorpay (if applicable).
+        razorpay_order_id (CharField): The order ID provided by Razorpay (if applicable); unique, as it is the
+            idempotency key of order finalization.
         razorpay_payment_status (CharField): The payment status provided by Razorpay (if applicable).
         razorpay_payment_id (CharField): The payment ID provided by Razorpay (if applicable).
         paid (BooleanField): Indicates whether the payment has been paid or not.
@@ -134,11 +172,49 @@ class Payment(models.Model):
     """
     user = models.ForeignKey(User,on_delete=models.CASCADE)
     amount = models.FloatField()
-    razorpay_order_id = models.CharField(max_length=100, blank=True, null=True)
+    razorpay_order_id = models.CharField(max_length=100, blank=True, null=True, unique=True)
     razorpay_payment_status = models.CharField(max_length=100, blank=True, null=True)
     razorpay_payment_id = models.CharField(max_length=100, blank=True, null=True)
     paid = models.BooleanField(default=False)
-    
+
+class Order(models.Model):
+    """
+    Represents one checkout, grouping the OrderPlaced lines paid together.
+
+    The totals are computed once when the order is finalized, so listing
+    orders or summing a customer's spend never aggregates the lines.
+
+    Attributes:
+        user (ForeignKey): The user who placed the order.
+        customer (ForeignKey): The delivery address of the order.
+        payment (OneToOneField): The payment of the order.
+        item_count (PositiveIntegerField): The number of lines in the order.
+        amount (FloatField): The total amount of the lines (before adding shipping cost).
+        shipping (FloatField): The shipping cost of the order.
+        total (FloatField): The total amount paid (including shipping cost).
+        status (CharField): The status of the order.
+        created (DateTimeField): The date and time when the order was placed.
+
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
+    payment = models.OneToOneField(Payment, on_delete=models.CASCADE)
+    item_count = models.PositiveIntegerField(default=0)
+    amount = models.FloatField(default=0)
+    shipping = models.FloatField(default=0)
+    total = models.FloatField(default=0)
+    status = models.CharField(max_length=50, choices=STATUS_CHOICES, default='Pending')
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created', '-id'], name='order_user_created_idx'),
+            models.Index(fields=['status'], name='order_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'Order {self.pk}'
+
 class OrderPlaced(models.Model):
     """
     Represents an order placed in the system.
@@ -151,6 +227,9 @@ class OrderPlaced(models.Model):
         ordered_date (DateTimeField): The date and time when the order was placed.
         status (CharField): The status of the order.
         payment (ForeignKey): The payment associated with the order.
+        unit_price (FloatField): The product's discounted price at the time of purchase.
+        line_total (FloatField): The amount paid for the line (quantity * unit price).
+        order (ForeignKey): The order header the line belongs to.
 
     """
     user = models.ForeignKey(User,on_delete=models.CASCADE)
@@ -160,6 +239,65 @@ class OrderPlaced(models.Model):
     ordered_date = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=50,choices=STATUS_CHOICES, default='pending')
     payment = models.ForeignKey(Payment, on_delete=models.CASCADE, default="")
+    unit_price = models.FloatField(null=True)
+    line_total = models.FloatField(null=True)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, null=True, related_name='lines')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-ordered_date', '-id'], name='orderplaced_user_date_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the order line, snapshotting the product's current price if it
+        was not set by the caller.
+
+        """
+        if self.unit_price is None:
+            self.unit_price = self.product.discounted_price
+        if self.line_total is None:
+            self.line_total = self.quantity * self.unit_price
+        super().save(*args, **kwargs)
+
     @property
     def total_cost(self):
-        return self.quantity * self.product.discounted_price
\ No newline at end of file
+        """
+        Returns the amount paid for the order line.
+
+        Returns:
+            The price snapshot taken at purchase time (quantity * unit price).
+
+        """
+        return self.line_total
+
+class SalesRollup(models.Model):
+    """
+    Represents the sales of one product on one day.
+
+    Rows are maintained incrementally as orders are finalized (see
+    app.reports) and can be rebuilt from the order lines with the
+    rebuild_sales_rollups management command. Reports read these rows
+    instead of scanning OrderPlaced.
+
+    Attributes:
+        day (DateField): The day of the sales.
+        product (ForeignKey): The product sold.
+        category (CharField): The category of the product when it was sold.
+        units (PositiveIntegerField): The number of units sold.
+        revenue (FloatField): The amount paid for the units sold.
+
+    """
+    day = models.DateField()
+    product = models.ForeignKey(Products, on_delete=models.CASCADE)
+    category = models.CharField(choices=CATEGORY_CHOICES, max_length=2)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='unique_salesrollup_day_product'),
+        ]
+        indexes = [
+            models.Index(fields=['day', 'category'], name='salesrollup_day_category_idx'),
+        ]
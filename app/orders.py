@@ -0,0 +1,112 @@
+from django.db import transaction
+from django.db.models import Prefetch, Sum, Value
+from django.db.models.functions import Coalesce
+from .cart import SHIPPING_COST, priced_lines
+from .models import Cart, Customer, Order, OrderPlaced, Payment
+from .pagination import keyset_paginate
+from .reports import record_sales
+
+ORDERS_PAGE_SIZE = 20
+
+
+class AmountMismatch(Exception):
+    """
+    Raised when the cart no longer costs what was paid for it, e.g. because
+    items were added between checkout and the payment callback.
+
+    """
+
+
+def order_history(user, cursor=None, per_page=ORDERS_PAGE_SIZE):
+    """
+    Returns one page of the user's orders, newest first.
+
+    The order headers are paged with a keyset over (created, id), served by
+    the (user, created, id) index, and their lines are prefetched with
+    their products in one more query, so the page costs the same however
+    long the history is.
+
+    Args:
+        user: The user whose orders are listed.
+        cursor: The next_cursor of the previous page, or None for the first page.
+        per_page: The maximum number of orders on a page.
+
+    Returns:
+        A KeysetPage of Order objects with their lines prefetched.
+
+    """
+    orders = Order.objects.filter(user=user).prefetch_related(
+        Prefetch('lines', queryset=OrderPlaced.objects.select_related('product').order_by('id')),
+    )
+    return keyset_paginate(orders, ['-created', '-id'], cursor, per_page)
+
+
+def lifetime_spend(user):
+    """
+    Returns the total amount the user has paid across all orders.
+
+    Args:
+        user: The user whose spend is summed.
+
+    Returns:
+        The sum of the precomputed order totals.
+
+    """
+    return Order.objects.filter(user=user).aggregate(spend=Coalesce(Sum('total'), Value(0.0)))['spend']
+
+
+def finalize_order(user, customer_id, razorpay_order_id, razorpay_payment_id):
+    """
+    Turns the user's cart into placed orders once the gateway confirms a payment.
+
+    Everything runs in one transaction: the Payment row is locked, the Order
+    header is created with its totals, the order lines are inserted with a
+    single bulk_create carrying their price snapshots, the daily sales
+    rollups are incremented, the cart is deleted in bulk and the payment is
+    marked paid. The cart must still cost the amount of the payment, or
+    nothing is changed.
+    razorpay_order_id acts as the idempotency key, so a retried gateway
+    callback for a payment that is already paid returns without changes.
+
+    Args:
+        user: The user who paid.
+        customer_id: The primary key of the delivery address chosen at checkout.
+        razorpay_order_id: The order ID provided by Razorpay.
+        razorpay_payment_id: The payment ID provided by Razorpay.
+
+    Returns:
+        A tuple of (payment, created), where created is False for a duplicate callback.
+
+    Raises:
+        Payment.DoesNotExist: If the user has no payment for the order ID.
+        Customer.DoesNotExist: If the address does not belong to the user.
+        AmountMismatch: If the cart total differs from the amount paid.
+
+    """
+    with transaction.atomic():
+        payment = Payment.objects.select_for_update().get(user=user, razorpay_order_id=razorpay_order_id)
+        if payment.paid:
+            return payment, False
+        customer = Customer.objects.get(pk=customer_id, User=user)
+        lines = list(priced_lines(user))
+        amount = sum(item.line_total for item in lines)
+        if abs(amount + SHIPPING_COST - payment.amount) > 0.005:
+            raise AmountMismatch(f'The cart costs {amount + SHIPPING_COST}, but {payment.amount} was paid.')
+        order = Order.objects.create(
+            user=user, customer=customer, payment=payment, item_count=len(lines),
+            amount=amount, shipping=SHIPPING_COST, total=amount + SHIPPING_COST,
+        )
+        placed = OrderPlaced.objects.bulk_create([
+            OrderPlaced(
+                user=user, customer=customer, product=item.product, quantity=item.quantity,
+                payment=payment, order=order, unit_price=item.product.discounted_price,
+                line_total=item.line_total, status=order.status,
+            )
+            for item in lines
+        ])
+        record_sales(placed)
+        Cart.objects.filter(pk__in=[item.pk for item in lines]).delete()
+        payment.paid = True
+        payment.razorpay_payment_id = razorpay_payment_id
+        payment.save(update_fields=['paid', 'razorpay_payment_id'])
+    return payment, True
@@ -0,0 +1,146 @@
+import base64
+import datetime
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """
+    JSON encoder for cursor values that keeps full datetime precision,
+    which DjangoJSONEncoder truncates to milliseconds.
+
+    """
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    """
+    Encodes the sort-key values of the last row of a page into an opaque cursor.
+
+    Args:
+        values: The list of sort-key values.
+
+    Returns:
+        A URL-safe cursor string.
+
+    """
+    return base64.urlsafe_b64encode(json.dumps(values, cls=CursorEncoder).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor produced by encode_cursor.
+
+    Args:
+        cursor: The cursor string, usually taken from the query string.
+
+    Returns:
+        The list of sort-key values, or None if the cursor is missing or malformed.
+
+    """
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+class KeysetPage:
+    """
+    Represents one page of a keyset-paginated queryset.
+
+    Attributes:
+        items (list): The objects on the page.
+        next_cursor (str): The cursor of the next page, or None on the last page.
+
+    """
+    def __init__(self, items, next_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def _after(keys, values):
+    """
+    Builds the filter selecting the rows that sort after the given key values.
+
+    """
+    condition = Q()
+    for i, key in enumerate(keys):
+        field = key.lstrip('-')
+        lookup = 'lt' if key.startswith('-') else 'gt'
+        clause = Q(**{f'{field}__{lookup}': values[i]})
+        for prev_key, prev_value in zip(keys[:i], values):
+            clause &= Q(**{prev_key.lstrip('-'): prev_value})
+        condition |= clause
+    return condition
+
+
+def _page_queryset(queryset, keys, cursor, per_page, prefix):
+    values = decode_cursor(cursor)
+    queryset = queryset.order_by(*keys)
+    if values and values[:len(prefix)] == prefix and len(values) == len(prefix) + len(keys):
+        queryset = queryset.filter(_after(keys, values[len(prefix):]))
+    # One extra row tells whether there is a next page.
+    return queryset[:per_page + 1]
+
+
+def _make_page(items, keys, per_page, prefix):
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        next_cursor = encode_cursor(prefix + [getattr(items[-1], key.lstrip('-')) for key in keys])
+    return KeysetPage(items, next_cursor)
+
+
+def keyset_paginate(queryset, keys, cursor=None, per_page=20, prefix=()):
+    """
+    Returns one page of a queryset using keyset (seek) pagination.
+
+    Unlike OFFSET pagination, the cost of a page does not grow with its
+    depth, because each page resumes with an indexed range filter after the
+    last row of the previous one.
+
+    Args:
+        queryset: The queryset to paginate.
+        keys: The ordering, e.g. ['-rank', '-id']. The last key must be unique.
+        cursor: The next_cursor of the previous page, or None for the first page.
+        per_page: The maximum number of objects on a page.
+        prefix: Extra leading values stored in the cursor (e.g. a search mode)
+                that must match for the cursor to be honoured.
+
+    Returns:
+        A KeysetPage.
+
+    """
+    prefix = list(prefix)
+    items = list(_page_queryset(queryset, keys, cursor, per_page, prefix))
+    return _make_page(items, keys, per_page, prefix)
+
+
+async def akeyset_paginate(queryset, keys, cursor=None, per_page=20, prefix=()):
+    """
+    Async version of keyset_paginate, fetching the page with the async ORM.
+
+    """
+    prefix = list(prefix)
+    items = [item async for item in _page_queryset(queryset, keys, cursor, per_page, prefix)]
+    return _make_page(items, keys, per_page, prefix)
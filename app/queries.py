@@ -0,0 +1,112 @@
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from django.db import connections
+
+# A statement run at least this many times in one request is reported as a
+# likely N+1 loop.
+REPEAT_THRESHOLD = 3
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_LIST_RE = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+
+
+def fingerprint(sql):
+    """
+    Normalizes a SQL statement so that executions differing only in their
+    parameters compare equal.
+
+    Args:
+        sql: The SQL, with placeholders or literal values.
+
+    Returns:
+        The statement with literals replaced by ? and IN lists collapsed.
+
+    """
+    sql = _WHITESPACE_RE.sub(' ', sql).strip()
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    return _LIST_RE.sub('(...)', sql)
+
+
+# The recorders active in the current context. Connections are per thread
+# and async views run the ORM in sync_to_async worker threads, which inherit
+# a copy of this context, so recording through a contextvar counts the
+# queries of a request whichever thread runs them.
+_active_recorders = ContextVar('query_recorders', default=())
+
+
+def _record(execute, sql, params, many, context):
+    recorders = _active_recorders.get()
+    if not recorders:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        for recorder in recorders:
+            recorder.add(sql, duration)
+
+
+def install_recorder(connection):
+    """
+    Installs the execute wrapper feeding the active QueryRecorders on a
+    connection. Called for every new connection by the connection_created
+    signal; installing it twice is harmless.
+
+    """
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record)
+
+
+class QueryRecorder:
+    """
+    Records the queries run on every database connection, in any thread,
+    by the code inside the block.
+
+    Use as a context manager around the code to inspect.
+
+    Attributes:
+        count (int): The number of queries run.
+        duration (float): Their total duration in seconds.
+        fingerprints (Counter): The number of executions of each normalized statement.
+
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self._lock = threading.Lock()
+        self._token = None
+
+    def add(self, sql, duration):
+        with self._lock:
+            self.duration += duration
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def __enter__(self):
+        # Connections opened before the signal receiver was connected.
+        for connection in connections.all(initialized_only=True):
+            install_recorder(connection)
+        self._token = _active_recorders.set(_active_recorders.get() + (self,))
+        return self
+
+    def __exit__(self, *exc_info):
+        _active_recorders.reset(self._token)
+
+    def repeated(self, threshold=REPEAT_THRESHOLD):
+        """
+        Returns the statements run at least threshold times, the likely N+1 loops.
+
+        Returns:
+            A list of (fingerprint, executions) pairs, most executed first.
+
+        """
+        return [(sql, n) for sql, n in self.fingerprints.most_common() if n >= threshold]
@@ -0,0 +1,94 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import OrderPlaced, SalesRollup
+
+DASHBOARD_DAYS = 30
+DASHBOARD_MAX_DAYS = 366
+REBUILD_BATCH_SIZE = 1000
+
+
+def record_sales(lines):
+    """
+    Adds freshly placed order lines to the daily sales rollups.
+
+    Each (day, product) row is incremented with an atomic F() update and
+    created when it does not exist yet. Call this inside the transaction
+    that creates the lines so the rollups never drift from the orders.
+
+    Args:
+        lines: The OrderPlaced objects just created, with their products loaded.
+
+    """
+    totals = defaultdict(lambda: [0, 0.0])
+    for line in lines:
+        key = (timezone.localdate(line.ordered_date), line.product_id, line.product.category)
+        totals[key][0] += line.quantity
+        totals[key][1] += line.line_total
+    for (day, product_id, category), (units, revenue) in totals.items():
+        rollup = SalesRollup.objects.filter(day=day, product_id=product_id)
+        if rollup.update(units=F('units') + units, revenue=F('revenue') + revenue):
+            continue
+        try:
+            with transaction.atomic():
+                SalesRollup.objects.create(
+                    day=day, product_id=product_id, category=category, units=units, revenue=revenue,
+                )
+        except IntegrityError:
+            # Another checkout created the row first.
+            rollup.update(units=F('units') + units, revenue=F('revenue') + revenue)
+
+
+def rebuild_sales_rollups(batch_size=REBUILD_BATCH_SIZE):
+    """
+    Recomputes every daily sales rollup from the order lines.
+
+    Args:
+        batch_size: The number of rollup rows inserted per query.
+
+    Returns:
+        The number of rollup rows written.
+
+    """
+    rows = (
+        OrderPlaced.objects.annotate(day=TruncDate('ordered_date'))
+        .values('day', 'product_id', 'product__category')
+        .annotate(units=Sum('quantity'), revenue=Sum('line_total'))
+        .order_by()
+    )
+    with transaction.atomic():
+        SalesRollup.objects.all().delete()
+        rollups = SalesRollup.objects.bulk_create(
+            [
+                SalesRollup(
+                    day=row['day'], product_id=row['product_id'], category=row['product__category'],
+                    units=row['units'], revenue=row['revenue'] or 0,
+                )
+                for row in rows
+            ],
+            batch_size=batch_size,
+        )
+    return len(rollups)
+
+
+def daily_category_sales(days=DASHBOARD_DAYS):
+    """
+    Returns revenue and units per day and category, read from the rollups.
+
+    Args:
+        days: The number of days, up to and including today, to report.
+
+    Returns:
+        A list of dicts with day, category, units and revenue, newest day first.
+
+    """
+    since = timezone.localdate() - timedelta(days=days - 1)
+    return list(
+        SalesRollup.objects.filter(day__gte=since)
+        .values('day', 'category')
+        .annotate(units=Sum('units'), revenue=Sum('revenue'))
+        .order_by('-day', 'category')
+    )
@@ -0,0 +1,152 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# GET and HEAD requests to these views, and to the admin changelists, read
+# from a replica. All other reads, and every write, use the primary.
+REPLICA_URL_NAMES = {
+    'home', 'category', 'category-title', 'product-detail', 'search', 'search-suggest', 'orders',
+    'api-category-list', 'api-product-list', 'api-product-detail',
+}
+# Models of these apps are always read from the primary: a login, a new
+# session or a new API token must be visible on the very next request.
+PRIMARY_APPS = {'auth', 'sessions', 'contenttypes', 'authtoken', 'admin'}
+# A request that writes sets this cookie, and the client's requests read
+# from the primary until it expires, so a shopper sees their own changes
+# (e.g. the new order right after checkout) however far the replicas lag.
+PIN_COOKIE = 'db_primary_until'
+
+
+class RoutingState:
+    """
+    How the current request reads from the database.
+
+    Attributes:
+        request (HttpRequest): The request, whose resolved view decides whether
+                               reads may go to a replica, or None outside requests.
+        replica_reads (bool): Whether reads may go to a replica regardless of the view.
+        pinned (bool): Whether the client recently wrote, so reads must use the primary.
+        wrote (bool): Whether this request wrote to the database.
+        replica (str): The replica alias chosen for the request, once one is needed.
+
+    """
+    def __init__(self, request=None, replica_reads=False, pinned=False):
+        self.request = request
+        self.replica_reads = replica_reads
+        self.pinned = pinned
+        self.wrote = False
+        self.replica = None
+
+    @property
+    def use_primary(self):
+        if self.pinned or self.wrote:
+            return True
+        # The view is only known once the URL is resolved.
+        return not (self.replica_reads or self.request is not None and is_replica_view(self.request))
+
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+@contextmanager
+def routing_state(state):
+    """
+    Makes state the routing state of the code run inside the block, including
+    the ORM calls async code runs in threads.
+
+    """
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+def use_replicas():
+    """
+    Lets the reads inside the block go to a replica until something is written.
+
+    """
+    return routing_state(RoutingState(replica_reads=True))
+
+
+def record_write():
+    """
+    Sends the following reads of the request to the primary and pins the
+    client to it. Called for writes that bypass the router, i.e. raw SQL.
+
+    """
+    state = _state.get()
+    if state is not None:
+        state.wrote = True
+
+
+def is_replica_view(request):
+    """
+    Returns whether the resolved view of a request may read from a replica.
+
+    """
+    match = request.resolver_match
+    if request.method not in ('GET', 'HEAD') or match is None:
+        return False
+    if match.namespace == 'admin':
+        return match.url_name is not None and match.url_name.endswith('_changelist')
+    return match.url_name in REPLICA_URL_NAMES
+
+
+def pinned_until(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0))
+    except ValueError:
+        return 0
+
+
+def pin_response(response):
+    """
+    Pins the client to the primary for REPLICA_PIN_SECONDS.
+
+    """
+    response.set_cookie(
+        PIN_COOKIE, str(int(time.time()) + settings.REPLICA_PIN_SECONDS),
+        max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax',
+    )
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of replica views to one of settings.DATABASE_REPLICAS.
+
+    Everything else uses the primary: writes, reads outside the replica
+    views (e.g. management commands), reads inside a transaction, reads of
+    PRIMARY_APPS models, and every read of a request after it wrote or of a
+    client pinned by an earlier write. Does nothing when no replicas are
+    configured.
+
+    """
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        replicas = settings.DATABASE_REPLICAS
+        if (not replicas or state is None or state.use_primary or model._meta.app_label in PRIMARY_APPS
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            # Explicit, as Django would otherwise read the relations of an
+            # instance from the replica it came from.
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            # One replica per request, so its reads all see the same lag.
+            state.replica = random.choice(replicas)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label not in PRIMARY_APPS:
+            record_write()
+        # Likewise, an instance read from a replica is saved to the primary.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
@@ -0,0 +1,124 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from .models import Products
+from .pagination import KeysetPage, akeyset_paginate, decode_cursor, keyset_paginate
+
+SEARCH_CONFIG = 'english'
+SEARCH_PAGE_SIZE = 12
+RANK_KEYS = ['-rank', '-id']
+
+# Relevance weight of a match in each field when ranking without PostgreSQL.
+FALLBACK_WEIGHTS = {
+    'title': 4,
+    'description': 2,
+    'composition': 1,
+    'prodapp': 1,
+}
+
+
+def search_document():
+    """
+    Builds the weighted full-text document stored in Products.search_vector.
+
+    Returns:
+        A SearchVector over the title (A), description (B), composition and application (C).
+
+    """
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+        + SearchVector('composition', 'prodapp', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vector(*product_ids):
+    """
+    Recomputes the stored search document of the given products.
+
+    This is a no-op on databases other than PostgreSQL, which search with
+    the fallback backend instead.
+
+    Args:
+        *product_ids: The primary keys of the products that changed.
+
+    """
+    if connection.vendor == 'postgresql':
+        Products.objects.filter(pk__in=product_ids).update(search_vector=search_document())
+
+
+def search_products(query, cursor=None, per_page=SEARCH_PAGE_SIZE):
+    """
+    Searches the products by title, description, composition and application.
+
+    On PostgreSQL results come from the GIN-indexed search_vector, ranked by
+    relevance; if nothing matches, the title is matched by trigram
+    similarity so that typos still find products. Other databases use a
+    weighted substring match.
+
+    Args:
+        query: The search text entered by the user.
+        cursor: The next_cursor of the previous page, or None for the first page.
+        per_page: The maximum number of products on a page.
+
+    Returns:
+        A KeysetPage of Products, most relevant first.
+
+    """
+    query = query.strip()
+    if not query:
+        return KeysetPage([])
+    if connection.vendor == 'postgresql':
+        values = decode_cursor(cursor)
+        if not values or values[0] != 'trgm':
+            page = keyset_paginate(_fts_queryset(query), RANK_KEYS, cursor, per_page, prefix=['fts'])
+            if page or cursor:
+                return page
+        return keyset_paginate(_trigram_queryset(query), RANK_KEYS, cursor, per_page, prefix=['trgm'])
+    return keyset_paginate(_fallback_queryset(query), RANK_KEYS, cursor, per_page, prefix=['like'])
+
+
+async def asearch_products(query, cursor=None, per_page=SEARCH_PAGE_SIZE):
+    """
+    Async version of search_products, fetching the page with the async ORM.
+
+    """
+    query = query.strip()
+    if not query:
+        return KeysetPage([])
+    if connection.vendor == 'postgresql':
+        values = decode_cursor(cursor)
+        if not values or values[0] != 'trgm':
+            page = await akeyset_paginate(_fts_queryset(query), RANK_KEYS, cursor, per_page, prefix=['fts'])
+            if page or cursor:
+                return page
+        return await akeyset_paginate(_trigram_queryset(query), RANK_KEYS, cursor, per_page, prefix=['trgm'])
+    return await akeyset_paginate(_fallback_queryset(query), RANK_KEYS, cursor, per_page, prefix=['like'])
+
+
+def _fts_queryset(query):
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+    return Products.objects.filter(search_vector=search_query).annotate(
+        rank=SearchRank(F('search_vector'), search_query),
+    )
+
+
+def _trigram_queryset(query):
+    # Used when nothing matches the full text: typo-tolerant trigram matching
+    # on the title, which the trigram GIN index serves through the % operator.
+    return Products.objects.filter(title__trigram_similar=query).annotate(
+        rank=TrigramSimilarity('title', query),
+    )
+
+
+def _fallback_queryset(query):
+    matches = Q()
+    score = Value(0)
+    for term in query.split():
+        term_match = Q()
+        for field, weight in FALLBACK_WEIGHTS.items():
+            lookup = Q(**{f'{field}__icontains': term})
+            term_match |= lookup
+            score = score + Case(When(lookup, then=Value(weight)), default=Value(0), output_field=IntegerField())
+        matches &= term_match
+    return Products.objects.filter(matches).annotate(rank=score)
@@ -0,0 +1,258 @@
+import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from .cart import SHIPPING_COST
+from .models import (
+    CATEGORY_CHOICES, STATE_CHOICES, STATUS_CHOICES, Cart, Customer, Order, OrderPlaced, Payment, Products,
+)
+from .reports import rebuild_sales_rollups
+from .search import update_search_vector
+from .suggest import invalidate_suggestions
+
+SEED_CHUNK_SIZE = 5000
+# Every seeded user shares this password, hashed once per run.
+SEED_PASSWORD = 'seed-password'
+# Order dates go back HISTORY_DAYS from the epoch, which is fixed so that
+# the same seed always gives the same dataset; pass a recent epoch for
+# history the sales dashboard shows.
+SEED_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+HISTORY_DAYS = 365
+MAX_LINES_PER_ORDER = 5
+MAX_CART_LINES = 4
+
+ADJECTIVES = ['Aloe', 'Shea', 'Cocoa', 'Honey', 'Rose', 'Mint', 'Charcoal', 'Oat', 'Argan', 'Vanilla',
+              'Lavender', 'Citrus', 'Marula', 'Baobab', 'Rooibos', 'Coconut']
+NOUNS = {
+    'CR': 'Cream', 'MS': 'Moisturiser', 'CM': 'Combo', 'WS': 'Face Wash', 'SR': 'Serum', 'BL': 'Lip Balm',
+}
+CITIES = ['Polokwane', 'Johannesburg', 'Pretoria', 'Mbombela', 'Mahikeng', 'Gqeberha', 'Cape Town']
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Seeder:
+    """
+    Generates a synthetic shop deterministically from a seed.
+
+    The same seed and sizes always produce the same rows. Rows are inserted
+    with chunked bulk_create, and every user gets the same password hash, so
+    the cost is dominated by the inserts themselves.
+
+    Attributes:
+        rng (Random): The random generator all values are drawn from.
+        prefix (str): The prefix of the seeded usernames, derived from the seed.
+        epoch (datetime): The date of the newest possible order and of the user sign-ups.
+
+    """
+    def __init__(self, seed=0, chunk_size=SEED_CHUNK_SIZE, progress=None, epoch=SEED_EPOCH):
+        self.rng = random.Random(seed)
+        self.prefix = f'seed{seed}-'
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.epoch = epoch.replace(microsecond=0)
+
+    def _report(self, label, count):
+        if self.progress:
+            self.progress(label, count)
+
+    def products(self, count):
+        """
+        Creates products spread over every category.
+
+        Returns:
+            A list of (id, category, discounted price) tuples of the products.
+
+        """
+        codes = sorted(code for code, name in CATEGORY_CHOICES)
+        created = []
+
+        def build():
+            for i in range(count):
+                code = codes[i % len(codes)]
+                price = round(self.rng.uniform(20, 600), 2)
+                yield Products(
+                    title=f'{self.rng.choice(ADJECTIVES)} {NOUNS[code]} {i}',
+                    selling_price=round(price * self.rng.uniform(1.05, 1.4), 2),
+                    discounted_price=price,
+                    description=f'{self.rng.choice(ADJECTIVES)} enriched {NOUNS[code].lower()} for daily care.',
+                    composition=', '.join(self.rng.sample(ADJECTIVES, 3)),
+                    prodapp='Apply to clean skin.',
+                    category=code,
+                    product_image=f'product/{code.lower()}.png',
+                )
+
+        for chunk in _chunks(build(), self.chunk_size):
+            products = Products.objects.bulk_create(chunk)
+            update_search_vector(*[product.pk for product in products])
+            created += [(product.pk, product.category, product.discounted_price) for product in products]
+            self._report('products', len(created))
+        invalidate_suggestions()
+        return created
+
+    def users(self, count):
+        """
+        Creates users, each with one Customer address.
+
+        Returns:
+            A list of (user id, customer id) tuples.
+
+        """
+        password = make_password(SEED_PASSWORD)
+        states = sorted(code for code, name in STATE_CHOICES)
+        created = []
+        for chunk in _chunks(range(count), self.chunk_size):
+            users = User.objects.bulk_create(
+                User(
+                    username=f'{self.prefix}{i}', email=f'{self.prefix}{i}@example.com', password=password,
+                    date_joined=self.epoch,
+                )
+                for i in chunk
+            )
+            customers = Customer.objects.bulk_create(
+                Customer(
+                    User=user, name=f'Shopper {user.username}', locality=f'{self.rng.randint(1, 300)} Main Road',
+                    city=self.rng.choice(CITIES), mobile=self.rng.randint(600000000, 849999999),
+                    zipcode=self.rng.randint(1, 9999), state=self.rng.choice(states),
+                )
+                for user in users
+            )
+            created += [(user.pk, customer.pk) for user, customer in zip(users, customers)]
+            self._report('users', len(created))
+        return created
+
+    def carts(self, users, products):
+        """
+        Fills the carts of the users with up to MAX_CART_LINES distinct products.
+
+        Returns:
+            The number of cart lines created.
+
+        """
+        def build():
+            for user_id, customer_id in users:
+                for product in self.rng.sample(products, min(self.rng.randint(0, MAX_CART_LINES), len(products))):
+                    yield Cart(user_id=user_id, product_id=product[0], quantity=self.rng.randint(1, 3))
+
+        count = 0
+        for chunk in _chunks(build(), self.chunk_size):
+            count += len(Cart.objects.bulk_create(chunk))
+            self._report('cart lines', count)
+        return count
+
+    def orders(self, users, products, line_count):
+        """
+        Creates paid orders of random users, with their payments and lines,
+        until line_count order lines exist.
+
+        Returns:
+            The number of orders created.
+
+        """
+        statuses = sorted(code for code, name in STATUS_CHOICES)
+        orders = lines = 0
+        # Each chunk of orders produces about chunk_size lines.
+        orders_per_chunk = max(self.chunk_size * 2 // (MAX_LINES_PER_ORDER + 1), 1)
+        while lines < line_count:
+            plans = []
+            while len(plans) < orders_per_chunk and lines < line_count:
+                size = min(self.rng.randint(1, MAX_LINES_PER_ORDER), line_count - lines)
+                picked = self.rng.sample(products, min(size, len(products)))
+                user_id, customer_id = self.rng.choice(users)
+                created = self.epoch - timedelta(seconds=self.rng.randint(0, HISTORY_DAYS * 86400))
+                items = [(product, self.rng.randint(1, 3)) for product in picked]
+                plans.append((user_id, customer_id, created, self.rng.choice(statuses), items))
+                lines += len(items)
+            orders += self._create_orders(plans, orders)
+            self._report('order lines', lines)
+        return orders
+
+    def _create_orders(self, plans, offset):
+        with transaction.atomic():
+            payments = Payment.objects.bulk_create(
+                Payment(
+                    user_id=user_id, amount=sum(p[2] * q for p, q in items) + SHIPPING_COST,
+                    razorpay_order_id=f'{self.prefix}order-{offset + i}',
+                    razorpay_payment_id=f'{self.prefix}pay-{offset + i}',
+                    razorpay_payment_status='captured', paid=True,
+                )
+                for i, (user_id, customer_id, created, status, items) in enumerate(plans)
+            )
+            orders = Order.objects.bulk_create(
+                Order(
+                    user_id=user_id, customer_id=customer_id, payment=payment,
+                    item_count=len(items), amount=payment.amount - SHIPPING_COST,
+                    shipping=SHIPPING_COST, total=payment.amount, status=status,
+                )
+                for payment, (user_id, customer_id, created, status, items) in zip(payments, plans)
+            )
+            OrderPlaced.objects.bulk_create(
+                (
+                    OrderPlaced(
+                        user_id=order.user_id, customer_id=order.customer_id, product_id=product[0],
+                        quantity=quantity, status=order.status,
+                        payment_id=order.payment_id, unit_price=product[2], line_total=product[2] * quantity,
+                        order=order,
+                    )
+                    for order, plan in zip(orders, plans)
+                    for product, quantity in plan[4]
+                ),
+                batch_size=self.chunk_size,
+            )
+            # created and ordered_date are auto_now_add, so the historical
+            # dates are set once the rows exist.
+            for order, plan in zip(orders, plans):
+                order.created = plan[2]
+            Order.objects.bulk_update(orders, ['created'], batch_size=self.chunk_size)
+            OrderPlaced.objects.filter(order__in=orders).update(
+                ordered_date=Subquery(Order.objects.filter(pk=OuterRef('order_id')).values('created')),
+            )
+        return len(orders)
+
+
+def seed_data(seed=0, products=1000, users=200, order_lines=10000, chunk_size=SEED_CHUNK_SIZE, progress=None,
+              epoch=SEED_EPOCH):
+    """
+    Seeds the database with a synthetic catalog, shoppers, carts and order history.
+
+    Args:
+        seed: The random seed; the same seed and sizes give the same data.
+        products: The number of products.
+        users: The number of users, each with one address and a random cart.
+        order_lines: The number of order lines, grouped in orders of 1 to MAX_LINES_PER_ORDER lines.
+        chunk_size: The number of rows inserted per query.
+        progress: A callable receiving (label, count) after each chunk.
+        epoch: The date of the newest possible order; orders go back HISTORY_DAYS from it.
+
+    Returns:
+        A dict with the number of rows created per kind.
+
+    Raises:
+        ValueError: If data was already seeded with this seed.
+
+    """
+    seeder = Seeder(seed, chunk_size, progress, epoch)
+    if User.objects.filter(username__startswith=seeder.prefix).exists():
+        raise ValueError(f'Users starting with {seeder.prefix} already exist; use another seed.')
+    product_rows = seeder.products(products)
+    user_rows = seeder.users(users)
+    counts = {
+        'products': len(product_rows),
+        'users': len(user_rows),
+        'cart lines': seeder.carts(user_rows, product_rows) if product_rows else 0,
+        'orders': seeder.orders(user_rows, product_rows, order_lines) if product_rows and user_rows else 0,
+    }
+    if counts['orders']:
+        counts['sales rollups'] = rebuild_sales_rollups(batch_size=chunk_size)
+    return counts
@@ -0,0 +1,82 @@
+from functools import wraps
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.base import SessionBase
+
+# GET and HEAD requests to views marked with session_free run without the
+# session: app.middleware.SessionMiddleware gives them an always-empty
+# SessionFreeStore and an anonymous user, so they never query the session
+# table, never set or refresh the session cookie, and do not Vary on Cookie.
+
+
+class SessionFreeStore(SessionBase):
+    """
+    The session of a session-free request. It is always empty, is never
+    loaded or saved, and silently drops anything stored in it.
+
+    """
+    def __init__(self):
+        super().__init__(session_key=None)
+
+    def load(self):
+        return {}
+
+    def exists(self, session_key):
+        return False
+
+    def create(self):
+        pass
+
+    def save(self, must_create=False):
+        pass
+
+    def delete(self, session_key=None):
+        pass
+
+    @classmethod
+    def clear_expired(cls):
+        pass
+
+
+def session_free(view_func):
+    """
+    Marks a view as not using the session on GET and HEAD requests.
+
+    The view sees an anonymous user even if the client is logged in, so it
+    must not depend on who is visiting. Other methods, e.g. the POST of the
+    login form, use the session as usual.
+
+    Args:
+        view_func: The view function, or the result of a class view's as_view().
+
+    Returns:
+        The marked view.
+
+    """
+    if iscoroutinefunction(view_func):
+        async def wrapper(*args, **kwargs):
+            return await view_func(*args, **kwargs)
+    else:
+        def wrapper(*args, **kwargs):
+            return view_func(*args, **kwargs)
+    wrapper.session_free = True
+    return wraps(view_func)(wrapper)
+
+
+def is_session_free(request, view_func):
+    return request.method in ('GET', 'HEAD') and getattr(view_func, 'session_free', False)
+
+
+async def _anonymous_user():
+    return AnonymousUser()
+
+
+def drop_session(request):
+    """
+    Replaces the lazy session and user of a request with empty ones, before
+    anything loads them.
+
+    """
+    request.session = SessionFreeStore()
+    request.user = AnonymousUser()
+    request.auser = _anonymous_user
@@ -0,0 +1,66 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .cart import invalidate_cart_summary
+from .catalog import invalidate_category_titles
+from .images import generate_derivatives
+from .models import Cart, Products
+from .queries import install_recorder
+from .search import update_search_vector
+from .suggest import suggestion_index
+
+
+@receiver(post_save, sender=Cart)
+@receiver(post_delete, sender=Cart)
+def cart_changed(sender, instance, **kwargs):
+    """
+    Invalidates the cached cart summary of the cart item's owner.
+
+    """
+    invalidate_cart_summary(instance.user_id)
+
+
+@receiver(post_save, sender=Products)
+@receiver(post_delete, sender=Products)
+def product_changed(sender, instance, **kwargs):
+    """
+    Invalidates the cached category sidebar titles, and the cached cart
+    summary of every user holding the product, since their subtotal depends
+    on its discounted price.
+
+    """
+    invalidate_category_titles()
+    user_ids = set(Cart.objects.filter(product_id=instance.pk).values_list('user_id', flat=True))
+    if user_ids:
+        invalidate_cart_summary(*user_ids)
+
+
+@receiver(post_save, sender=Products)
+def product_saved(sender, instance, **kwargs):
+    """
+    Refreshes the stored full-text search document and the suggestion
+    index entries of the product, and creates the thumbnails of a newly
+    uploaded image.
+
+    """
+    update_search_vector(instance.pk)
+    suggestion_index.update_product(instance.pk, instance.title)
+    generate_derivatives(instance.product_image)
+
+
+@receiver(post_delete, sender=Products)
+def product_deleted(sender, instance, **kwargs):
+    """
+    Drops the product from the suggestion index.
+
+    """
+    suggestion_index.remove_product(instance.pk)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    """
+    Lets QueryRecorder count the queries of the new connection.
+
+    """
+    install_recorder(connection)
@@ -22,54 +22,104 @@ $('#slider1, #slider2, #slider3').owlCarousel({
     }
 })
 
-$('.plus-cart').click(function(){
-    var id=$(this).attr("pid").toString();
-    var eml=this.parentNode.children[2] 
+// Cart clicks are coalesced per product and sent as one batch once the
+// shopper pauses, instead of one request per click.
+var pendingCart = {}
+var cartTimer = null
+var cartInFlight = false
+
+function getCookie(name) {
+    var match = document.cookie.match('(^|;)\\s*' + name + '=([^;]*)')
+    return match ? decodeURIComponent(match[2]) : null
+}
+
+function queueCartUpdate(id, delta, remove) {
+    var entry = pendingCart[id] || {prod_id: id, delta: 0}
+    if (remove) {
+        entry.remove = true
+    } else {
+        entry.delta += delta
+    }
+    pendingCart[id] = entry
+    clearTimeout(cartTimer)
+    cartTimer = setTimeout(flushCart, 300)
+}
+
+function flushCart() {
+    if (cartInFlight || $.isEmptyObject(pendingCart)) {
+        return
+    }
+    var updates = Object.values(pendingCart)
+    pendingCart = {}
+    cartInFlight = true
     $.ajax({
-        type:"GET",
-        url:"/pluscart",
-        data:{
-            prod_id:id
-        },
+        type:"POST",
+        url:"/cart/batch/",
+        contentType:"application/json",
+        headers:{"X-CSRFToken": getCookie("csrftoken")},
+        data:JSON.stringify({updates: updates}),
         success:function(data){
-            eml.innerText=data.quantity 
-            document.getElementById("amount").innerText=data.amount 
+            data.lines.forEach(function(line){
+                var row = $('.cart-line[data-pid="' + line.prod_id + '"]')
+                if (line.quantity > 0) {
+                    row.find('.cart-quantity').text(line.quantity)
+                } else {
+                    row.next('hr').remove()
+                    row.remove()
+                }
+            })
+            document.getElementById("amount").innerText=data.amount
             document.getElementById("totalamount").innerText=data.totalamount
+        },
+        complete:function(){
+            cartInFlight = false
+            flushCart()
         }
     })
+}
+
+$('.plus-cart').click(function(){
+    var id=$(this).attr("pid").toString();
+    var eml=this.parentNode.children[2]
+    eml.innerText=parseInt(eml.innerText) + 1
+    queueCartUpdate(id, 1, false)
 })
 
 $('.minus-cart').click(function(){
     var id=$(this).attr("pid").toString();
-    var eml=this.parentNode.children[2] 
-    $.ajax({
-        type:"GET",
-        url:"/minuscart",
-        data:{
-            prod_id:id
-        },
-        success:function(data){
-            eml.innerText=data.quantity 
-            document.getElementById("amount").innerText=data.amount 
-            document.getElementById("totalamount").innerText=data.totalamount
-        }
-    })
+    var eml=this.parentNode.children[2]
+    eml.innerText=Math.max(parseInt(eml.innerText) - 1, 0)
+    queueCartUpdate(id, -1, false)
 })
 
 
-$('.remove-cart').click(function(){
+$('.remove-cart').click(function(event){
+    event.preventDefault()
     var id=$(this).attr("pid").toString();
-    var eml=this
-    $.ajax({
-        type:"GET",
-        url:"/removecart",
-        data:{
-            prod_id:id
-        },
-        success:function(data){
-            document.getElementById("amount").innerText=data.amount 
-            document.getElementById("totalamount").innerText=data.totalamount
-            eml.parentNode.parentNode.parentNode.parentNode.remove() 
-        }
-    })
+    queueCartUpdate(id, 0, true)
+})
+
+
+// Search-as-you-type suggestions for the navbar search box, which only
+// offers them to logged-in users, like the catalog pages they link to.
+var suggestTimer = null
+
+$('input[list="search-suggestions"]').on('input', function(){
+    var q=this.value
+    clearTimeout(suggestTimer)
+    suggestTimer = setTimeout(function(){
+        $.ajax({
+            type:"GET",
+            url:"/search/suggest/",
+            data:{
+                q:q
+            },
+            success:function(data){
+                var list=$('#search-suggestions').empty()
+                data.suggestions.forEach(function(s){
+                    list.append($('<option>').attr('value', s.label))
+                })
+            }
+        })
+    }, 150)
 })
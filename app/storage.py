@@ -0,0 +1,91 @@
+import gzip
+import os
+from io import BytesIO
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from PIL import Image
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; only gzip variants are written without it.
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.xml', '.map', '.eot', '.ttf')
+# Variants smaller than this fraction of the original are not worth serving.
+MIN_COMPRESSION_RATIO = 0.95
+
+
+class PrecompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Static files storage producing content-hashed file names, losslessly
+    optimized PNGs and gzip/brotli precompressed variants.
+
+    Everything is done once by ``manage.py collectstatic``; at runtime
+    app.middleware.StaticAssetMiddleware serves the results.
+
+    """
+    def url_converter(self, name, hashed_files, template=None):
+        converter = super().url_converter(name, hashed_files, template)
+
+        def tolerant_converter(matchobj):
+            # Vendored CSS such as all.min.css references webfonts that are
+            # not shipped; keep those URLs as they are instead of failing.
+            try:
+                return converter(matchobj)
+            except ValueError:
+                return matchobj.group(0)
+
+        return tolerant_converter
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed = {}
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed[name] = hashed_name
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name, hashed_name in hashed.items():
+            if name.lower().endswith('.png'):
+                self.optimize_png(hashed_name, name)
+            elif name.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+                for path in {name, hashed_name}:
+                    self.compress(path)
+
+    def optimize_png(self, path, *copies):
+        """
+        Rewrites a PNG with maximum zlib compression if that makes it smaller.
+        The pixels are unchanged.
+
+        Args:
+            path: The name of the PNG.
+            copies: Names of identical copies, e.g. the unhashed original, rewritten alongside.
+
+        """
+        full_path = self.path(path)
+        with Image.open(full_path) as image:
+            image.load()
+            params = {'optimize': True}
+            if 'transparency' in image.info:
+                params['transparency'] = image.info['transparency']
+            buffer = BytesIO()
+            image.save(buffer, 'PNG', **params)
+        if buffer.tell() < os.path.getsize(full_path):
+            for target in (path, *copies):
+                with open(self.path(target), 'wb') as f:
+                    f.write(buffer.getvalue())
+
+    def compress(self, path):
+        """
+        Writes the .gz (and, when brotli is installed, .br) variants of a file.
+
+        """
+        full_path = self.path(path)
+        with open(full_path, 'rb') as f:
+            content = f.read()
+        variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['.br'] = brotli.compress(content)
+        for suffix, compressed in variants.items():
+            if len(compressed) < len(content) * MIN_COMPRESSION_RATIO:
+                with open(full_path + suffix, 'wb') as f:
+                    f.write(compressed)
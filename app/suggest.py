@@ -0,0 +1,174 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.urls import reverse
+from .models import CATEGORY_CHOICES, Products
+
+SUGGEST_LIMIT = 8
+SUGGEST_MAX_LIMIT = 20
+# A counter in the shared cache, bumped by every change to the products.
+# An index built at an older generation missed changes made by another
+# process or by a bulk write, and is reloaded.
+SUGGEST_GENERATION_KEY = 'suggest-generation'
+
+
+def normalize(text):
+    return ' '.join(text.lower().split())
+
+
+def _keys(text):
+    """
+    Returns the keys under which a label is indexed: the whole label and
+    the remainder starting at each following word, so "Aloe Wash" is found
+    by both "alo" and "was".
+
+    """
+    words = normalize(text).split(' ')
+    return {' '.join(words[i:]) for i in range(len(words)) if words[i]}
+
+
+def current_generation():
+    generation = cache.get(SUGGEST_GENERATION_KEY)
+    if generation is None:
+        # Started from the clock, so a counter evicted from the cache and
+        # recreated does not repeat an earlier generation.
+        cache.add(SUGGEST_GENERATION_KEY, time.time_ns(), None)
+        generation = cache.get(SUGGEST_GENERATION_KEY)
+    return generation
+
+
+def invalidate_suggestions():
+    """
+    Makes every process reload its suggestion index on next use. Called
+    after bulk writes to the products, which send no signals.
+
+    Returns:
+        The new generation.
+
+    """
+    try:
+        return cache.incr(SUGGEST_GENERATION_KEY)
+    except ValueError:
+        return current_generation()
+
+
+class SuggestionIndex:
+    """
+    An in-process prefix index over product titles and category names.
+
+    Entries are kept in a sorted list of (key, label, kind, url) tuples, so a
+    prefix lookup is a bisect followed by a short scan. The index is loaded
+    from the database on first use and then kept current incrementally by
+    the Products post_save/post_delete signals, so suggestions never query
+    the database. Each worker process holds its own copy, and reloads it
+    when the generation in the shared cache shows that it missed a change.
+
+    """
+    def __init__(self):
+        self._entries = []
+        self._by_product = {}
+        self._loaded = False
+        self._generation = None
+        self._lock = threading.RLock()
+
+    def _insert(self, label, kind, url):
+        added = []
+        for key in _keys(label):
+            entry = (key, label, kind, url)
+            insort(self._entries, entry)
+            added.append(entry)
+        return added
+
+    def _remove(self, entries):
+        for entry in entries:
+            i = bisect_left(self._entries, entry)
+            if i < len(self._entries) and self._entries[i] == entry:
+                del self._entries[i]
+
+    def load(self):
+        """
+        Rebuilds the index from the categories and all products.
+
+        """
+        with self._lock:
+            # Read first, so changes made during the load cause another one.
+            self._generation = current_generation()
+            self._entries = []
+            self._by_product = {}
+            for code, name in CATEGORY_CHOICES:
+                self._insert(name, 'category', reverse('category', args=[code]))
+            # From the primary, as the index is kept for the life of the process.
+            for pk, title in Products.objects.using(DEFAULT_DB_ALIAS).values_list('id', 'title').iterator():
+                self._by_product[pk] = self._insert(title, 'product', reverse('product-detail', args=[pk]))
+            self._loaded = True
+
+    def update_product(self, pk, title):
+        """
+        Re-indexes one product after it was saved.
+
+        Args:
+            pk: The primary key of the product.
+            title: The title of the product.
+
+        """
+        with self._lock:
+            if self._loaded:
+                self._remove(self._by_product.pop(pk, []))
+                self._by_product[pk] = self._insert(title, 'product', reverse('product-detail', args=[pk]))
+            self._changed()
+
+    def remove_product(self, pk):
+        """
+        Drops one product from the index after it was deleted.
+
+        Args:
+            pk: The primary key of the product.
+
+        """
+        with self._lock:
+            if self._loaded:
+                self._remove(self._by_product.pop(pk, []))
+            self._changed()
+
+    def _changed(self):
+        # Tells the other processes, and keeps this index current if it
+        # missed nothing but the change it just applied.
+        generation = invalidate_suggestions()
+        if self._loaded and generation == self._generation + 1:
+            self._generation = generation
+
+    def suggest(self, prefix, limit=SUGGEST_LIMIT):
+        """
+        Returns the labels starting with the given prefix.
+
+        Args:
+            prefix: The text typed so far.
+            limit: The maximum number of suggestions.
+
+        Returns:
+            A list of dicts with label, kind ('product' or 'category') and url, ordered by the matched text.
+
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        if not self._loaded or self._generation != current_generation():
+            self.load()
+        suggestions = []
+        seen = set()
+        with self._lock:
+            i = bisect_left(self._entries, (prefix,))
+            while i < len(self._entries) and len(suggestions) < limit:
+                key, label, kind, url = self._entries[i]
+                if not key.startswith(prefix):
+                    break
+                if url not in seen:
+                    seen.add(url)
+                    suggestions.append({'label': label, 'kind': kind, 'url': url})
+                i += 1
+        return suggestions
+
+
+suggestion_index = SuggestionIndex()
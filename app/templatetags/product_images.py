@@ -0,0 +1,43 @@
+from django import template
+from django.utils.html import format_html
+from app.images import FALLBACK_WIDTH, derivative_srcsets, derivative_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, sizes, width='', height='', css_class='', alt=''):
+    """
+    Renders a product image as a <picture> offering the WebP and JPEG
+    thumbnails, letting the browser download the smallest fitting one.
+
+    Falls back to a plain <img> of the original until the thumbnails exist.
+
+    Usage:
+        {% responsive_image prod.product_image "300px" width="300px" height="200px" %}
+
+    Args:
+        image: The ImageFieldFile of the product.
+        sizes: The sizes attribute, i.e. the rendered width of the image.
+        width: The width attribute of the <img>.
+        height: The height attribute of the <img>.
+        css_class: The class attribute of the <img>.
+        alt: The alt text of the <img>.
+
+    Returns:
+        The HTML of the image.
+
+    """
+    if not image:
+        return ''
+    srcsets = derivative_srcsets(image.name)
+    if not srcsets:
+        return format_html(
+            '<img src="{}" width="{}" height="{}" class="{}" alt="{}">', image.url, width, height, css_class, alt,
+        )
+    fallback = derivative_url(image.name, FALLBACK_WIDTH, 'jpg')
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" class="{}" alt="{}" loading="lazy"></picture>',
+        srcsets['webp'], sizes, fallback, srcsets['jpg'], sizes, width, height, css_class, alt,
+    )
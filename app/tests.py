@@ -1,3 +1,923 @@
-from django.test import TestCase
+import asyncio
+import importlib
+import json
+import os
+import runpy
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.http import Http404
+from django.template import Context, Template
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from . import async_views
+from .benchmark import BenchmarkResults, percentile
+from .cart import SHIPPING_COST, cart_summary_key, get_cart_summary, price_cart
+from .catalog import CATEGORY_PAGE_SIZE, CATEGORY_TITLES_KEY, category_titles
+from .images import derivative_name
+from .journeys import InProcessClient, new_payment_factory, search_journey, shopper_journey
+from .management.commands.benchmark_db_connections import variant_settings
+from .models import Cart, Customer, Order, OrderPlaced, Payment, Products, SalesRollup
+from .orders import ORDERS_PAGE_SIZE, finalize_order, lifetime_spend, order_history
+from .product_io import export_products, import_products, read_rows
+from .queries import QueryRecorder, fingerprint
+from .reports import daily_category_sales
+from .routers import PIN_COOKIE, use_replicas
+from .search import search_products
+from .seed import SEED_EPOCH, seed_data
+from .suggest import SuggestionIndex, invalidate_suggestions, suggestion_index
 
 # Create your tests here.
+def make_product(title='Aloe Cream', price=100.0, category='CR'):
+    return Products.objects.create(
+        title=title, selling_price=price + 20, discounted_price=price,
+        description='A soothing cream', category=category, product_image='product/test.png',
+    )
+
+
+class CartSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('mary', password='maryjane123')
+        self.product = make_product()
+
+    def test_summary_is_cached_until_cart_changes(self):
+        Cart.objects.create(user=self.user, product=self.product, quantity=2)
+        self.assertEqual(get_cart_summary(self.user), {'count': 1, 'subtotal': 200.0})
+        with self.assertNumQueries(0):
+            get_cart_summary(self.user)
+
+        Cart.objects.create(user=self.user, product=make_product('Balm', 50.0))
+        self.assertEqual(get_cart_summary(self.user), {'count': 2, 'subtotal': 250.0})
+
+    def test_summary_follows_product_price(self):
+        Cart.objects.create(user=self.user, product=self.product)
+        get_cart_summary(self.user)
+        self.product.discounted_price = 80.0
+        self.product.save()
+        self.assertEqual(get_cart_summary(self.user)['subtotal'], 80.0)
+
+    def test_summary_cached_before_commit_is_dropped_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+            Cart.objects.create(user=self.user, product=self.product)
+            # A concurrent request caching what it read before the commit.
+            cache.set(cart_summary_key(self.user.pk), {'count': 0, 'subtotal': 0.0})
+            cache.set(CATEGORY_TITLES_KEY.format('CR'), [])
+        self.assertEqual(get_cart_summary(self.user)['count'], 1)
+        self.assertEqual(category_titles('CR'), [{'title': 'Aloe Cream'}])
+
+    def test_badge_rendered_from_context_processor(self):
+        Cart.objects.create(user=self.user, product=self.product)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['totalitem'], 1)
+
+
+class CartPricingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('mary', password='maryjane123')
+
+    def fill_cart(self, size):
+        for i in range(size):
+            Cart.objects.create(user=self.user, product=make_product(f'Product {i}', 10.0), quantity=2)
+
+    def test_price_cart_is_a_single_query(self):
+        self.fill_cart(5)
+        with self.assertNumQueries(1):
+            pricing = price_cart(self.user)
+            self.assertEqual([item.total_cost for item in pricing['lines']], [20.0] * 5)
+        self.assertEqual(pricing['amount'], 100.0)
+        self.assertEqual(pricing['totalamount'], 100.0 + SHIPPING_COST)
+
+    def cart_page_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('showcart'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx)
+
+    def test_cart_page_query_count_independent_of_cart_size(self):
+        self.client.force_login(self.user)
+        self.fill_cart(1)
+        small = self.cart_page_queries()
+        self.fill_cart(10)
+        self.assertEqual(self.cart_page_queries(), small)
+
+
+class CartBatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('mary', password='maryjane123')
+        self.client.force_login(self.user)
+        self.cream = make_product('Cream', 10.0)
+        self.balm = make_product('Balm', 5.0)
+        Cart.objects.create(user=self.user, product=self.cream, quantity=1)
+        Cart.objects.create(user=self.user, product=self.balm, quantity=3)
+
+    def post_updates(self, updates):
+        return self.client.post(
+            reverse('cart-batch'), json.dumps({'updates': updates}), content_type='application/json',
+        )
+
+    def test_batch_coalesces_deltas_and_returns_changed_lines(self):
+        response = self.post_updates([
+            {'prod_id': self.balm.id, 'delta': 1},
+            {'prod_id': self.balm.id, 'delta': 1},
+            {'prod_id': self.cream.id, 'delta': -5},
+        ])
+        data = response.json()
+        self.assertEqual(data['lines'], [
+            {'prod_id': self.balm.id, 'quantity': 5, 'line_total': 25.0},
+            {'prod_id': self.cream.id, 'quantity': 0, 'line_total': 0},
+        ])
+        self.assertEqual(data['amount'], 25.0)
+        self.assertFalse(Cart.objects.filter(product=self.cream).exists())
+        self.assertEqual(get_cart_summary(self.user)['count'], 1)
+
+    def test_batch_remove(self):
+        data = self.post_updates([{'prod_id': self.balm.id, 'delta': 2}, {'prod_id': self.balm.id, 'remove': True}]).json()
+        self.assertEqual(data['lines'][0]['quantity'], 0)
+        self.assertEqual(data['totalamount'], 10.0 + SHIPPING_COST)
+
+    def test_batch_rejects_malformed_body(self):
+        self.assertEqual(self.post_updates([{'delta': 1}]).status_code, 400)
+        self.assertEqual(self.post_updates([{'prod_id': self.balm.id, 'delta': 10 ** 30}]).status_code, 400)
+        self.assertEqual(Cart.objects.get(product=self.balm).quantity, 3)
+        self.assertEqual(self.client.get(reverse('cart-batch')).status_code, 405)
+
+
+class AddToCartTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('mary', password='maryjane123')
+        self.client.force_login(self.user)
+        self.product = make_product()
+
+    def test_repeated_adds_increment_a_single_line(self):
+        for _ in range(3):
+            self.client.get(reverse('add-to-cart'), {'prod_id': self.product.id})
+        line = Cart.objects.get(user=self.user)
+        self.assertEqual(line.quantity, 3)
+        self.assertEqual(get_cart_summary(self.user), {'count': 1, 'subtotal': 300.0})
+
+    def test_unknown_product(self):
+        self.assertEqual(self.client.get(reverse('add-to-cart'), {'prod_id': 999}).status_code, 404)
+        self.assertEqual(self.client.get(reverse('add-to-cart'), {'prod_id': 'x'}).status_code, 404)
+        self.assertFalse(Cart.objects.exists())
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('mary', password='maryjane123')
+        self.client.force_login(self.user)
+
+    def test_ranks_title_matches_first_and_searches_all_fields(self):
+        by_description = make_product('Night Balm')
+        by_description.description = 'Rich in aloe'
+        by_description.save()
+        by_title = make_product('Aloe Wash')
+        make_product('Rose Serum')
+        page = search_products('aloe')
+        self.assertEqual(list(page), [by_title, by_description])
+
+    def test_keyset_pages(self):
+        products = [make_product(f'Aloe {i}') for i in range(5)]
+        first = search_products('aloe', per_page=2)
+        second = search_products('aloe', cursor=first.next_cursor, per_page=2)
+        third = search_products('aloe', cursor=second.next_cursor, per_page=2)
+        self.assertEqual(list(first) + list(second) + list(third), products[::-1])
+        self.assertFalse(third.has_next)
+
+    def test_search_view(self):
+        make_product('Aloe Wash')
+        response = self.client.get(reverse('search'), {'search': 'wash'})
+        self.assertEqual([p.title for p in response.context['product']], ['Aloe Wash'])
+        self.assertEqual(len(self.client.get(reverse('search')).context['product']), 0)
+
+
+class SuggestionIndexTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('mary', password='maryjane123')
+        self.client.force_login(self.user)
+        self.index = SuggestionIndex()
+
+    def labels(self, prefix):
+        return [s['label'] for s in self.index.suggest(prefix)]
+
+    def test_prefix_matches_titles_words_and_categories(self):
+        make_product('Aloe Wash')
+        make_product('Cream Cleanser')
+        self.assertEqual(self.labels('alo'), ['Aloe Wash'])
+        self.assertEqual(self.labels('WAS'), ['Aloe Wash', 'Wash'])
+        self.assertEqual(self.labels('cre'), ['Cream', 'Cream Cleanser'])
+        with self.assertNumQueries(0):
+            self.index.suggest('c')
+
+    def test_index_follows_product_signals(self):
+        suggestion_index.load()
+        product = make_product('Rose Serum')
+        self.assertEqual(suggestion_index.suggest('rose')[0]['url'], reverse('product-detail', args=[product.pk]))
+        product.title = 'Violet Serum'
+        product.save()
+        self.assertEqual(suggestion_index.suggest('rose'), [])
+        product.delete()
+        self.assertEqual(suggestion_index.suggest('violet'), [])
+
+    def test_suggest_view(self):
+        response = self.client.get(reverse('search-suggest'), {'q': 'bal'})
+        self.assertEqual(response.json()['suggestions'][0]['label'], 'Balm')
+
+    def test_index_reloads_after_changes_it_missed(self):
+        self.assertEqual(self.labels('ros'), [])
+        # Another process's save, and a bulk write without signals.
+        SuggestionIndex().update_product(make_product('Rose Serum').pk, 'Rose Serum')
+        self.assertEqual(self.labels('ros'), ['Rose Serum'])
+        Products.objects.bulk_create([Products(
+            title='Shea Soap', selling_price=10, discounted_price=8, description='Soap', category='CR',
+            product_image='product/test.png',
+        )])
+        invalidate_suggestions()
+        self.assertEqual(self.labels('shea'), ['Shea Soap'])
+        with self.assertNumQueries(0):
+            self.index.suggest('shea')
+
+    def test_suggestions_only_offered_to_logged_in_users(self):
+        self.assertContains(self.client.get(reverse('home')), 'id="search-suggestions"')
+        self.client.logout()
+        self.assertNotContains(self.client.get(reverse('about')), 'search-suggestions')
+
+
+class CategoryViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('mary', password='maryjane123')
+        self.client.force_login(self.user)
+
+    def test_products_are_keyset_paginated(self):
+        products = [make_product(f'Cream {i}') for i in range(CATEGORY_PAGE_SIZE + 2)]
+        first = self.client.get(reverse('category', args=['CR'])).context['products']
+        self.assertEqual(list(first), products[:CATEGORY_PAGE_SIZE])
+        second = self.client.get(reverse('category', args=['CR']), {'after': first.next_cursor}).context['products']
+        self.assertEqual(list(second), products[CATEGORY_PAGE_SIZE:])
+        self.assertFalse(second.has_next)
+
+    def test_sidebar_titles_cached_until_products_change(self):
+        make_product('Cream B')
+        self.assertEqual(category_titles('CR'), [{'title': 'Cream B'}])
+        with self.assertNumQueries(0):
+            category_titles('CR')
+        make_product('Cream A')
+        self.assertEqual(category_titles('CR'), [{'title': 'Cream A'}, {'title': 'Cream B'}])
+
+    def test_category_title(self):
+        make_product('Cream A')
+        response = self.client.get(reverse('category-title', args=['Cream A']))
+        self.assertEqual(response.context['title'], [{'title': 'Cream A'}])
+        self.assertEqual(self.client.get(reverse('category-title', args=['Nope'])).status_code, 404)
+
+
+class ProductFragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('mary', password='maryjane123')
+        self.client.force_login(self.user)
+
+    def test_saving_a_product_bumps_its_version_and_refreshes_fragments(self):
+        product = make_product('Aloe Wash', 100.0, category='WS')
+        self.assertEqual(product.version, 1)
+        self.assertContains(self.client.get(reverse('product-detail', args=[product.pk])), 'R.100.0/-')
+        self.assertContains(self.client.get(reverse('category', args=['WS'])), 'R.100.0/-')
+
+        product.discounted_price = 90.0
+        product.save(update_fields=['discounted_price'])
+        product.refresh_from_db()
+        self.assertEqual(product.version, 2)
+        self.assertContains(self.client.get(reverse('product-detail', args=[product.pk])), 'R.90.0/-')
+        self.assertContains(self.client.get(reverse('category', args=['WS'])), 'R.90.0/-')
+
+    def test_saves_of_stale_copies_get_distinct_versions(self):
+        product = make_product('Aloe Wash')
+        first, second = Products.objects.get(pk=product.pk), Products.objects.get(pk=product.pk)
+        first.save()
+        second.save()
+        self.assertEqual((first.version, second.version), (2, 3))
+
+
+def make_order_line(user, product, quantity=1, **kwargs):
+    customer = Customer.objects.filter(User=user).first() or Customer.objects.create(
+        User=user, name='Mary', locality='Main Road', city='Polokwane', zipcode=699, state='PLK',
+    )
+    amount = product.discounted_price * quantity
+    payment = Payment.objects.create(user=user, amount=amount, paid=True)
+    order = Order.objects.create(
+        user=user, customer=customer, payment=payment, item_count=1, amount=amount, total=amount,
+    )
+    return OrderPlaced.objects.create(
+        user=user, customer=customer, product=product, quantity=quantity, payment=payment, order=order, **kwargs
+    )
+
+
+class OrderHistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('mary', password='maryjane123')
+        self.client.force_login(self.user)
+
+    def test_lines_keep_the_price_paid(self):
+        product = make_product(price=100.0)
+        line = make_order_line(self.user, product, quantity=2)
+        product.discounted_price = 150.0
+        product.save()
+        line.refresh_from_db()
+        self.assertEqual((line.unit_price, line.total_cost), (100.0, 200.0))
+
+    def order_page_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('orders'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx)
+
+    def test_order_page_query_count_independent_of_history(self):
+        make_order_line(self.user, make_product())
+        few = self.order_page_queries()
+        for i in range(ORDERS_PAGE_SIZE + 5):
+            make_order_line(self.user, make_product(f'Product {i}'))
+        self.assertEqual(self.order_page_queries(), few)
+
+    def test_pages_newest_first(self):
+        orders = [make_order_line(self.user, make_product(f'Product {i}')).order for i in range(3)]
+        first = order_history(self.user, per_page=2)
+        second = order_history(self.user, cursor=first.next_cursor, per_page=2)
+        self.assertEqual(list(first) + list(second), orders[::-1])
+        self.assertEqual(lifetime_spend(self.user), 300.0)
+
+    def test_admin_status_change_reaches_lines_and_order_page(self):
+        line = make_order_line(self.user, make_product())
+        order = line.order
+        self.client.force_login(User.objects.create_superuser('admin', password='admin123'))
+        response = self.client.post(reverse('admin:app_order_change', args=[order.pk]), {
+            'user': self.user.pk, 'customer': order.customer_id, 'status': 'Packed',
+            'lines-TOTAL_FORMS': 1, 'lines-INITIAL_FORMS': 1, 'lines-MIN_NUM_FORMS': 0, 'lines-MAX_NUM_FORMS': 1000,
+            'lines-0-id': line.pk, 'lines-0-order': order.pk,
+        })
+        self.assertEqual(response.status_code, 302)
+        line.refresh_from_db()
+        self.assertEqual(line.status, 'Packed')
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse('orders')), 'Order Status : Packed')
+
+    def test_order_migration_normalises_legacy_status(self):
+        migration = importlib.import_module('app.migrations.0010_order')
+        line = make_order_line(self.user, make_product(), status='pending')
+        OrderPlaced.objects.filter(pk=line.pk).update(order=None)
+        line.order.delete()
+        migration.create_order_headers(apps, None)
+        line.refresh_from_db()
+        self.assertEqual((line.status, line.order.status), ('Pending', 'Pending'))
+
+
+class PaymentDoneTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('mary', password='maryjane123')
+        self.client.force_login(self.user)
+        self.customer = Customer.objects.create(
+            User=self.user, name='Mary', locality='Main Road', city='Polokwane', zipcode=699, state='PLK',
+        )
+        self.payment = Payment.objects.create(user=self.user, amount=340.0, razorpay_order_id='order_1')
+        Cart.objects.create(user=self.user, product=make_product('Cream', 100.0), quantity=2)
+        Cart.objects.create(user=self.user, product=make_product('Balm', 50.0), quantity=2)
+
+    def pay(self):
+        return self.client.get(reverse('paymentdone'), {
+            'order_id': 'order_1', 'payment_id': 'pay_1', 'cust_id': self.customer.id,
+        })
+
+    def test_finalizes_once(self):
+        self.assertRedirects(self.pay(), reverse('orders'))
+        self.assertRedirects(self.pay(), reverse('orders'))
+        self.assertEqual(
+            sorted(OrderPlaced.objects.values_list('quantity', 'unit_price', 'line_total')),
+            [(2, 50.0, 100.0), (2, 100.0, 200.0)],
+        )
+        self.assertFalse(Cart.objects.exists())
+        order = Order.objects.get()
+        self.assertEqual((order.item_count, order.amount, order.total), (2, 300.0, 300.0 + SHIPPING_COST))
+        self.assertEqual(list(order.lines.values_list('status', flat=True)), ['Pending', 'Pending'])
+        self.payment.refresh_from_db()
+        self.assertTrue(self.payment.paid)
+        self.assertEqual(self.payment.razorpay_payment_id, 'pay_1')
+
+    def test_cart_changed_after_checkout(self):
+        Cart.objects.create(user=self.user, product=make_product('Wash', 30.0))
+        self.assertRedirects(self.pay(), reverse('checkout'))
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Cart.objects.count(), 3)
+        self.payment.refresh_from_db()
+        self.assertFalse(self.payment.paid)
+
+    def test_unknown_payment(self):
+        response = self.client.get(reverse('paymentdone'), {'order_id': 'nope', 'cust_id': self.customer.id})
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(Cart.objects.exists())
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('mary', password='maryjane123')
+        self.cream = make_product('Cream', 100.0, category='CR')
+        self.balm = make_product('Balm', 50.0, category='BL')
+
+    def checkout(self, order_id, *items):
+        customer = Customer.objects.filter(User=self.user).first() or Customer.objects.create(
+            User=self.user, name='Mary', locality='Main Road', city='Polokwane', zipcode=699, state='PLK',
+        )
+        amount = sum(product.discounted_price * quantity for product, quantity in items) + SHIPPING_COST
+        Payment.objects.create(user=self.user, amount=amount, razorpay_order_id=order_id)
+        for product, quantity in items:
+            Cart.objects.create(user=self.user, product=product, quantity=quantity)
+        finalize_order(self.user, customer.id, order_id, 'pay')
+
+    def rollups(self):
+        return sorted(SalesRollup.objects.values_list('product__title', 'category', 'units', 'revenue'))
+
+    def test_rollups_follow_orders_and_rebuild_matches(self):
+        self.checkout('order_1', (self.cream, 2), (self.balm, 1))
+        self.checkout('order_2', (self.cream, 1))
+        expected = [('Balm', 'BL', 1, 50.0), ('Cream', 'CR', 3, 300.0)]
+        self.assertEqual(self.rollups(), expected)
+        call_command('rebuild_sales_rollups', stdout=StringIO())
+        self.assertEqual(self.rollups(), expected)
+        self.assertEqual(
+            [(row['category'], row['units'], row['revenue']) for row in daily_category_sales()],
+            [('BL', 1, 50.0), ('CR', 3, 300.0)],
+        )
+
+    def test_dashboard_reads_rollups(self):
+        self.checkout('order_1', (self.cream, 2))
+        admin_user = User.objects.create_superuser('admin', password='admin123')
+        self.client.force_login(admin_user)
+        response = self.client.get(reverse('admin:app_salesrollup_changelist'))
+        self.assertContains(response, 'Cream')
+        self.assertContains(response, '200.00')
+        for days, shown in (('99999999999', 366), ('x', 30)):
+            response = self.client.get(reverse('admin:app_salesrollup_changelist'), {'days': days})
+            self.assertEqual(response.context['days'], shown)
+
+    def test_dashboard_requires_view_permission(self):
+        staff = User.objects.create_user('staff', password='staff123', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(reverse('admin:app_salesrollup_changelist')).status_code, 403)
+
+
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def upload(self, name='product/aloe.png', size=(800, 400)):
+        buffer = BytesIO()
+        Image.new('RGBA', size, (0, 128, 0, 128)).save(buffer, 'PNG')
+        return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    def test_thumbnails_created_on_save_and_rendered_as_srcset(self):
+        product = make_product()
+        product.product_image = self.upload()
+        product.save()
+        with Image.open(default_storage.path(derivative_name(product.product_image.name, 300, 'webp'))) as thumb:
+            self.assertEqual(thumb.size, (300, 150))
+        html = Template('{% load product_images %}{% responsive_image image "300px" %}').render(
+            Context({'image': product.product_image})
+        )
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('aloe.png-600.jpg 600w', html)
+
+    def test_backfill_command(self):
+        product = make_product()
+        Products.objects.filter(pk=product.pk).update(product_image=self.upload('product/old.png', (50, 50)))
+        call_command('backfill_thumbnails', stdout=StringIO())
+        with Image.open(default_storage.path('product/derivatives/old.png-600.jpg')) as thumb:
+            self.assertEqual(thumb.size, (50, 50))
+
+    def test_same_stem_with_different_extensions(self):
+        self.assertNotEqual(
+            derivative_name('product/k1.png', 300, 'webp'), derivative_name('product/k1.jpg', 300, 'webp'),
+        )
+
+
+class StaticAssetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        static_root = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(static_root.cleanup)
+        settings_override = override_settings(
+            STATIC_ROOT=static_root.name,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'app.storage.PrecompressedManifestStaticFilesStorage'},
+            },
+        )
+        settings_override.enable()
+        cls.addClassCleanup(settings_override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        cls.style = staticfiles_storage.stored_name('app/css/style.css')
+
+    def test_collectstatic_writes_hashed_and_precompressed_files(self):
+        self.assertRegex(self.style, r'^app/css/style\.[0-9a-f]{12}\.css$')
+        self.assertTrue(os.path.exists(staticfiles_storage.path(self.style) + '.gz'))
+
+    def test_hashed_assets_are_immutable_and_negotiated(self):
+        response = self.client.get(f'/static/{self.style}', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        plain = self.client.get(f'/static/{self.style}')
+        self.assertNotIn('Content-Encoding', plain)
+
+    def test_unhashed_assets_revalidate(self):
+        response = self.client.get('/static/app/css/style.css')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=0, must-revalidate')
+        not_modified = self.client.get(
+            '/static/app/css/style.css', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        default_storage.save('product/data.bin', ContentFile(bytes(range(100))))
+        self.url = '/media/product/data.bin'
+
+    def test_full_and_conditional_responses(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(100)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(self.client.get('/media/product/missing.bin').status_code, 404)
+        self.assertEqual(self.client.get('/media/../ec/settings.py').status_code, 404)
+
+    def test_byte_ranges(self):
+        partial = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(b''.join(partial.streaming_content), bytes(range(10, 20)))
+        suffix = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(suffix.streaming_content), bytes(range(95, 100)))
+        unsatisfiable = self.client.get(self.url, HTTP_RANGE='bytes=200-')
+        self.assertEqual(unsatisfiable.status_code, 416)
+        stale = self.client.get(self.url, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(stale.status_code, 200)
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect')
+    def test_offload_to_front_server(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/product/data.bin')
+        self.assertEqual(response.content, b'')
+
+
+class ProductImportExportTests(TestCase):
+    def test_export_then_import_updates_in_place(self):
+        product = make_product('Aloe Cream')
+        out = StringIO()
+        self.assertEqual(export_products(out, 'csv'), 1)
+        edited = StringIO(out.getvalue().replace('Aloe Cream', 'Aloe Cream XL'))
+        stats = import_products(read_rows(edited, 'csv'), make_thumbnails=False)
+        self.assertEqual((stats['created'], stats['updated']), (0, 1))
+        product.refresh_from_db()
+        self.assertEqual((product.title, product.version), ('Aloe Cream XL', 2))
+
+    def test_import_chunks_skips_invalid_rows_and_ingests_images(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        images = tempfile.TemporaryDirectory()
+        self.addCleanup(images.cleanup)
+        Image.new('RGB', (40, 40)).save(os.path.join(images.name, 'wash.png'))
+        rows = [
+            {'title': f'Wash {i}', 'selling_price': '60', 'discounted_price': '50',
+             'description': 'Gentle', 'category': 'WS', 'image': 'wash.png'}
+            for i in range(5)
+        ]
+        rows.append({'title': 'Broken', 'selling_price': 'free', 'discounted_price': '1',
+                     'description': 'x', 'category': 'WS', 'product_image': 'product/x.png'})
+        with override_settings(MEDIA_ROOT=media.name), self.assertNumQueries(9):
+            stats = import_products(
+                iter(rows), chunk_size=2, image_dir=images.name,
+                make_thumbnails=False,
+            )
+        self.assertEqual(stats['created'], 5)
+        self.assertEqual(stats['errors'], [(6, 'selling_price must be a number')])
+        self.assertTrue(Products.objects.get(title='Wash 0').product_image.name.startswith('product/wash'))
+
+    def test_duplicate_ids_are_reported(self):
+        row = {'selling_price': '60', 'discounted_price': '50', 'description': 'Gentle', 'category': 'WS',
+               'product_image': 'product/wash.png'}
+        rows = [{**row, 'id': '500', 'title': 'Wash'}, {**row, 'id': '500', 'title': 'Wash again'}]
+        stats = import_products(iter(rows), make_thumbnails=False)
+        self.assertEqual((stats['created'], stats['errors']), (1, [(2, 'duplicate id 500')]))
+        self.assertEqual(Products.objects.get(pk=500).title, 'Wash')
+
+    def test_malformed_json_lines_are_reported(self):
+        row = {'title': 'Wash', 'selling_price': 60, 'discounted_price': 50, 'description': 'Gentle',
+               'category': 'WS', 'product_image': 'product/wash.png'}
+        stream = StringIO(f'{{"title": \n[1, 2]\n{json.dumps(row)}\n')
+        stats = import_products(read_rows(stream, 'jsonl'), make_thumbnails=False)
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['errors'], [(1, 'not valid JSON'), (2, 'not an object')])
+
+
+class AsyncViewTests(TestCase):
+    """
+    Runs the async views on an event loop, where any synchronous query
+    (e.g. from a context processor) raises SynchronousOnlyOperation.
+
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('mary', password='maryjane123')
+        self.product = make_product('Aloe Cream')
+        Cart.objects.create(user=self.user, product=self.product, quantity=2)
+
+    def get(self, view, path, **kwargs):
+        request = AsyncRequestFactory().get(path)
+        user = self.user
+
+        async def auser():
+            return user
+
+        request.auser = auser
+        return view(request, **kwargs)
+
+    async def test_catalog_pages(self):
+        response = await self.get(async_views.CategoryView.as_view(), '/category/CR', val='CR')
+        self.assertContains(response, 'Aloe Cream')
+        self.assertContains(response, '<span class="badge bg-danger"> 1  </span>', html=False)
+        response = await self.get(async_views.ProductDetail.as_view(), '/product-detail/1/', pk=self.product.pk)
+        self.assertContains(response, 'Aloe Cream')
+        with self.assertRaises(Http404):
+            await self.get(async_views.ProductDetail.as_view(), '/product-detail/0/', pk=0)
+        response = await self.get(async_views.search, '/search/?search=aloe')
+        self.assertContains(response, 'Aloe Cream')
+        self.assertEqual((await self.get(async_views.home, '/home/')).status_code, 200)
+
+    async def test_rendering_blocks_off_the_event_loop(self):
+        on_loop = []
+
+        def blocking(original):
+            def call(*args, **kwargs):
+                try:
+                    asyncio.get_running_loop()
+                    on_loop.append(original)
+                except RuntimeError:
+                    pass
+                return original(*args, **kwargs)
+            return call
+
+        with mock.patch.object(cache, 'get', blocking(cache.get)), \
+                mock.patch.object(default_storage, 'exists', blocking(default_storage.exists)):
+            await self.get(async_views.CategoryView.as_view(), '/category/CR', val='CR')
+            await self.get(async_views.ProductDetail.as_view(), '/product-detail/1/', pk=self.product.pk)
+        self.assertEqual(on_loop, [])
+
+    async def test_show_cart(self):
+        response = await self.get(async_views.show_cart, '/cart/')
+        self.assertContains(response, f'{2 * self.product.discounted_price + SHIPPING_COST}')
+        self.assertIn('csrftoken', response.cookies)
+
+
+class QueryInspectionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('mary', password='maryjane123')
+        self.client.force_login(self.user)
+
+    def test_repeated_statements_are_fingerprinted(self):
+        products = [make_product(f'Cream {i}') for i in range(3)]
+        with QueryRecorder() as recorder:
+            for product in products:
+                Products.objects.get(pk=product.pk)
+        self.assertEqual(recorder.count, 3)
+        self.assertEqual(len(recorder.repeated()), 1)
+        self.assertEqual(fingerprint("SELECT 1 WHERE id IN (%s, %s) AND t = 'x'"), 'SELECT ? WHERE id IN (...) AND t = ?')
+
+    @override_settings(QUERY_INSPECTION=True, QUERY_BUDGET=1)
+    def test_headers_and_budget_warning(self):
+        with self.assertLogs('app.queries', 'WARNING') as logs:
+            response = self.client.get(reverse('category', args=['CR']))
+        queries = int(response['X-DB-Queries'])
+        self.assertGreater(queries, 1)
+        self.assertRegex(response['Server-Timing'], rf'^db;dur=[\d.]+;desc="{queries} queries"$')
+        self.assertIn('(category)', logs.output[0])
+
+    @override_settings(QUERY_INSPECTION=True)
+    async def test_async_requests_count_queries_of_worker_threads(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('category', args=['CR']))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response['X-DB-Queries']), 0)
+
+    def test_disabled_by_default(self):
+        self.assertNotIn('X-DB-Queries', self.client.get(reverse('about')))
+
+
+class BenchmarkJourneyTests(TestCase):
+    def test_percentiles(self):
+        values = list(range(1, 101))
+        self.assertEqual((percentile(values, 50), percentile(values, 99)), (50, 99))
+        self.assertEqual(percentile([], 95), 0)
+
+    def test_journeys_record_every_step(self):
+        user = User.objects.create_user('mary', password='maryjane123')
+        customer = Customer.objects.create(
+            User=user, name='Mary', locality='Main Road', city='Polokwane', zipcode=700, state='PLK',
+        )
+        product = make_product('Aloe Cream')
+        shopper = {'username': 'mary', 'password': 'maryjane123', 'customer_id': customer.pk}
+        item = {'id': product.pk, 'title': product.title, 'category': product.category}
+        results = BenchmarkResults()
+        shopper_journey(InProcessClient(), results, shopper, item, new_payment_factory(user))
+        search_journey(InProcessClient(), results, shopper, item)
+        report = results.report()
+        self.assertEqual(report['urls']['login']['requests'], 2)
+        self.assertGreater(report['urls']['orders']['queries_mean'], 0)
+        self.assertEqual(Order.objects.filter(user=user).count(), 1)
+
+
+class SeedDataTests(TestCase):
+    def test_seeding_is_deterministic_and_consistent(self):
+        counts = seed_data(seed=7, products=12, users=5, order_lines=40, chunk_size=8)
+        self.assertEqual((counts['products'], counts['users']), (12, 5))
+        self.assertEqual(OrderPlaced.objects.count(), 40)
+        self.assertEqual(Order.objects.count(), counts['orders'])
+        titles = list(Products.objects.order_by('id').values_list('title', flat=True))
+        order = Order.objects.order_by('id').first()
+        self.assertAlmostEqual(order.amount, sum(line.line_total for line in order.lines.all()))
+        self.assertGreater(Order.objects.values('created').distinct().count(), 1)
+        self.assertTrue(self.client.login(username='seed7-0', password='seed-password'))
+        with self.assertRaises(ValueError):
+            seed_data(seed=7, products=1, users=1, order_lines=0)
+        self.assertEqual(order.item_count, order.lines.count())
+        self.assertLessEqual(Order.objects.latest('created').created, SEED_EPOCH)
+        self.assertFalse(OrderPlaced.objects.exclude(ordered_date=F('order__created')).exists())
+        history = list(Order.objects.order_by('id').values_list('created', 'item_count', 'total'))
+        Products.objects.all().delete()
+        User.objects.all().delete()
+        seed_data(seed=7, products=12, users=5, order_lines=40, chunk_size=8)
+        self.assertEqual(list(Products.objects.order_by('id').values_list('title', flat=True)), titles)
+        self.assertEqual(list(Order.objects.order_by('id').values_list('created', 'item_count', 'total')), history)
+
+
+def load_settings(**env):
+    """
+    Runs ec/settings.py with the given environment variables, and the other
+    variables it reads unset, and returns its globals.
+
+    """
+    with mock.patch.dict(os.environ, env):
+        for name in {'DB_ENGINE', 'POSTGRES_CONN_MODE', 'CACHE_BACKEND', 'CACHE_LOCATION'} - env.keys():
+            os.environ.pop(name, None)
+        return runpy.run_path(settings.BASE_DIR / 'ec' / 'settings.py')
+
+
+class SettingsTests(TestCase):
+    def test_cache_backend_from_environment(self):
+        self.assertEqual(load_settings()['CACHES']['default']['BACKEND'], 'django.core.cache.backends.locmem.LocMemCache')
+        redis = load_settings(CACHE_BACKEND='redis', CACHE_LOCATION='redis://cache:6379/0')['CACHES']['default']
+        self.assertEqual(redis, {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379/0',
+        })
+        with self.assertRaises(ImproperlyConfigured):
+            load_settings(CACHE_BACKEND='disk')
+
+
+class DatabaseConnectionBenchmarkTests(TestCase):
+    def test_variant_settings(self):
+        base = {'ENGINE': 'django.db.backends.postgresql', 'NAME': 'ec', 'CONN_MAX_AGE': 600, 'OPTIONS': {}}
+        self.assertEqual(variant_settings(base, 'new', 4)['OPTIONS'], {})
+        self.assertNotIn('CONN_MAX_AGE', variant_settings(base, 'new', 4))
+        persistent = variant_settings(base, 'persistent', 4)
+        self.assertIsNone(persistent['CONN_MAX_AGE'])
+        self.assertTrue(persistent['CONN_HEALTH_CHECKS'])
+        self.assertEqual(variant_settings(base, 'pool', 4)['OPTIONS']['pool']['max_size'], 4)
+
+    def test_connection_mode_follows_server_mode(self):
+        self.assertEqual(load_settings(SERVER_MODE='wsgi')['DATABASES']['default']['CONN_MAX_AGE'], 600)
+        asgi = load_settings(SERVER_MODE='asgi')
+        self.assertEqual(asgi['POSTGRES_CONN_MODE'], 'new')
+        self.assertNotIn('CONN_MAX_AGE', asgi['DATABASES']['default'])
+        with self.assertRaises(ImproperlyConfigured):
+            load_settings(SERVER_MODE='asgi', POSTGRES_CONN_MODE='persistent')
+
+    def test_command_reports_each_mode(self):
+        out = StringIO()
+        call_command('benchmark_db_connections', requests=20, concurrency=2, modes=['new', 'persistent'], stdout=out)
+        self.assertIn('new: 20 requests', out.getvalue())
+        self.assertIn('persistent: 20 requests', out.getvalue())
+
+
+@skipUnless('replica' in settings.DATABASES, 'needs the SQLite replica of DB_ENGINE=sqlite')
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Uses the SQLite replica database, which unlike a real replica is never
+    synchronized, to see which database served each read.
+
+    """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.product = make_product('Aloe Cream')
+        Products.objects.using('replica').create(
+            pk=self.product.pk, title='Stale Cream', selling_price=120, discounted_price=100,
+            description='A soothing cream', category='CR', product_image='product/test.png',
+        )
+        # The primary moved on since the replica copy was made.
+        self.product.save()
+
+    def test_router(self):
+        self.assertEqual(Products.objects.all().db, 'default')
+        with use_replicas():
+            self.assertEqual(Products.objects.all().db, 'replica')
+            self.assertEqual(User.objects.all().db, 'default')
+            self.assertEqual(Products.objects.get(pk=self.product.pk).title, 'Stale Cream')
+            make_product('Shea Butter')
+            self.assertEqual(Products.objects.all().db, 'default')
+
+    def test_client_reads_primary_after_writing(self):
+        user = User.objects.create_user('mary', password='maryjane123')
+        self.client.force_login(user)
+        url = reverse('product-detail', args=[self.product.pk])
+        self.assertContains(self.client.get(url), 'Stale Cream')
+        self.assertEqual(self.client.get(reverse('showcart')).context['cart'], [])
+        response = self.client.get(reverse('add-to-cart'), {'prod_id': self.product.pk})
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertContains(self.client.get(url), 'Aloe Cream')
+        self.client.cookies.pop(PIN_COOKIE)
+        self.assertContains(self.client.get(url), 'Stale Cream')
+
+    def test_shared_caches_are_filled_from_the_primary(self):
+        user = User.objects.create_user('mary', password='maryjane123')
+        Cart.objects.create(user=user, product=self.product, quantity=2)
+        with use_replicas():
+            self.assertEqual(get_cart_summary(user)['count'], 1)
+            self.assertEqual(category_titles('CR'), [{'title': 'Aloe Cream'}])
+            index = SuggestionIndex()
+            index.load()
+            self.assertEqual([s['label'] for s in index.suggest('aloe')], ['Aloe Cream'])
+
+
+class SessionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('mary', password='maryjane123')
+
+    def test_session_free_pages(self):
+        self.client.force_login(self.user)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('about'))
+        self.assertFalse(response.context['user'].is_authenticated)
+        self.assertEqual(response.cookies, {})
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+        self.client.logout()
+        response = self.client.get(reverse('login'))
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        response = self.client.post(reverse('login'), {'username': 'mary', 'password': 'maryjane123'})
+        self.assertRedirects(response, reverse('profile'), fetch_redirect_response=False)
+        self.assertIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+    def test_session_engines_without_session_queries(self):
+        for engine in ('cached_db', 'signed_cookies'):
+            with self.subTest(engine), override_settings(SESSION_ENGINE=f'django.contrib.sessions.backends.{engine}'):
+                client = self.client_class()
+                client.force_login(self.user)
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertEqual(client.get(reverse('home')).status_code, 200)
+                self.assertFalse([q for q in queries if 'django_session' in q['sql']])
@@ -1,20 +1,24 @@
-from django.urls import path
-from . import views
+import re
+from django.urls import path, re_path
+from . import async_views, media, views
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib.auth import views as auth_view
 from .forms import loginForm
+from .sessions import session_free
 from .forms import MyPasswordResetForm, MyPasswordChangeForm, MySetPasswordForm
 from django.contrib import admin
 
+# The hot read-only pages have async versions used under ASGI.
+catalog_views = async_views if settings.ASYNC_VIEWS else views
+
 urlpatterns = [
     # home and product detail pages
-    path('home/', views.home, name="home"),
+    path('home/', catalog_views.home, name="home"),
     path('about/', views.about, name="about"),
     path('contact/', views.contact, name="contact"),
-    path('category/<slug:val>', views.CategoryView.as_view(), name="category"),
+    path('category/<slug:val>', catalog_views.CategoryView.as_view(), name="category"),
     path('category-title/<val>', views.CategoryTitle.as_view(), name="category-title"),
-    path('product-detail/<int:pk>/', views.ProductDetail.as_view(), name="product-detail"),
+    path('product-detail/<int:pk>/', catalog_views.ProductDetail.as_view(), name="product-detail"),
     path('profile/', views.ProfileView.as_view(), name="profile"),
     path('address/', views.address, name="address"),
     path('updateAddress/<int:pk>/', views.updateAddress.as_view(), name="updateAddress"),
@@ -22,7 +26,7 @@ urlpatterns = [
 
     # login auth
     path('registration/', views.CustomerRegistrationView.as_view(), name="customerregistration"),
-    path('', auth_view.LoginView.as_view(template_name='app/login.html', authentication_form=loginForm), name='login'),
+    path('', session_free(auth_view.LoginView.as_view(template_name='app/login.html', authentication_form=loginForm)), name='login'),
     path('passwordChange/', auth_view.PasswordChangeView.as_view(template_name='app/changepassword.html', form_class = MyPasswordChangeForm , success_url='/passwordChangedone') , name='passwordchange'),
     path('passwordChangedone/', auth_view.PasswordChangeDoneView.as_view(template_name='app/passwordchangedone.html'), name='passwordchangedone'),
     path('logout/', auth_view.LogoutView.as_view(next_page='login'), name="logout"),
@@ -35,19 +39,23 @@ urlpatterns = [
 
     # add to cart
     path('add-to-cart/', views.add_to_cart, name="add-to-cart"),
-    path('cart/', views.show_cart, name="showcart"),
+    path('cart/', catalog_views.show_cart, name="showcart"),
     path('checkout/', views.checkout.as_view(), name="checkout"),
-    # path('paymentdone/', views.payment_done(), name="paymentdone"),
+    path('paymentdone/', views.payment_done, name="paymentdone"),
     path('orders/', views.orders, name="orders"),
 
     # cart functionality
-    path('pluscart/', views.plus_cart),
-    path('minuscart/', views.minus_cart),
-    path('removecart/', views.remove_cart),
+    path('pluscart/', views.plus_cart, name="pluscart"),
+    path('minuscart/', views.minus_cart, name="minuscart"),
+    path('removecart/', views.remove_cart, name="removecart"),
+    path('cart/batch/', views.cart_batch, name="cart-batch"),
+
+    path('search/', catalog_views.search, name='search'),
+    path('search/suggest/', views.search_suggest, name='search-suggest'),
 
-    path('search/', views.search, name='search'),
-    
-]+static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # uploaded product images
+    re_path(r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), media.serve_media, name='media'),
+]
  
 admin.site.site_header = "Kgothatso"
 admin.site.site_title = "Kgothatso"
@@ -1,14 +1,23 @@
-from django.shortcuts import render ,redirect
+from django.shortcuts import get_object_or_404, render ,redirect
 from django.views import View
-from .models import Customer, Products, Cart, OrderPlaced
+from .models import Customer, Products, Payment
 from . forms import CustomerRegistrationForm, CustomerProfileForm
+from .cart import MAX_CART_DELTA, add_product, apply_cart_deltas, price_cart
+from .catalog import CATEGORY_PAGE_SIZE, category_titles
+from .orders import AmountMismatch, finalize_order, order_history
+from .pagination import keyset_paginate
+from .search import search_products
+from .sessions import session_free
+from .suggest import SUGGEST_LIMIT, SUGGEST_MAX_LIMIT, suggestion_index
 from django.contrib import messages
-from django.http import JsonResponse
-from django.db.models import Q
+from django.http import Http404, JsonResponse
 #import razorpay
 #from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_POST
+import json
 
 # Create your views here.
 @login_required
@@ -20,15 +29,12 @@ def home(request):
         request: The HTTP request object.
 
     Returns:
-        The rendered home.html template with the following context variables:
-            - totalitem: The total number of items in the user's cart, if the user is authenticated.
+        The rendered home.html template.
 
     """
-    totalitem=0
-    if request.user.is_authenticated:
-        totalitem = len(Cart.objects.filter(user=request.user))
     return render(request,"app/home.html", locals())
 
+@session_free
 def about(request):
     """
     Renders the about page.
@@ -37,13 +43,9 @@ def about(request):
         request: The HTTP request object.
 
     Returns:
-        The rendered about.html template with the following context variables:
-            - totalitem: The total number of items in the user's cart, if the user is authenticated.
+        The rendered about.html template.
 
     """
-    totalitem=0
-    if request.user.is_authenticated:
-        totalitem = len(Cart.objects.filter(user=request.user))
     return render(request,"app/about.html", locals())
 
 @login_required
@@ -55,13 +57,9 @@ def contact(request):
         request: The HTTP request object.
 
     Returns:
-        The rendered contact.html template with the following context variables:
-            - totalitem: The total number of items in the user's cart, if the user is authenticated.
+        The rendered contact.html template.
 
     """
-    totalitem=0
-    if request.user.is_authenticated:
-        totalitem = len(Cart.objects.filter(user=request.user))
     return render(request,"app/contact.html", locals())
 
 @method_decorator(login_required, name='dispatch')
@@ -89,16 +87,14 @@ class CategoryView(View):
 
         Returns:
             The rendered category.html template with the following context variables:
-                - totalitem: The total number of items in the user's cart, if the user is authenticated.
-                - products: The products filtered by the given category value.
-                - title: The titles of the products filtered by the given category value.
+                - products: A page of the products filtered by the given category value.
+                - title: The cached titles of the products filtered by the given category value.
 
         """
-         totalitem=0
-         if request.user.is_authenticated:
-            totalitem = len(Cart.objects.filter(user=request.user))
-         products = Products.objects.filter(category=val)
-         title = Products.objects.filter(category=val).values('title')
+         products = keyset_paginate(
+             Products.objects.filter(category=val), ['id'], request.GET.get('after'), CATEGORY_PAGE_SIZE,
+         )
+         title = category_titles(val)
          return render(request,"app/category.html",locals())
      
 @method_decorator(login_required, name='dispatch')
@@ -126,16 +122,14 @@ class CategoryTitle(View):
 
         Returns:
             The rendered category.html template with the following context variables:
-                - totalitem: The total number of items in the user's cart, if the user is authenticated.
                 - products: The products filtered by the given title value.
-                - title: The titles of the products with the same category as the first product in the filtered result.
+                - title: The cached titles of the products with the same category as the first product in the filtered result.
 
         """
-         totalitem=0
-         if request.user.is_authenticated:
-            totalitem = len(Cart.objects.filter(user=request.user))
-         products = Products.objects.filter(title=val)
-         title = Products.objects.filter(category=products[0].category).values('title')
+         products = list(Products.objects.filter(title=val)[:CATEGORY_PAGE_SIZE])
+         if not products:
+             raise Http404("Product not found")
+         title = category_titles(products[0].category)
          return render(request,"app/category.html",locals())
      
 @method_decorator(login_required, name='dispatch')
@@ -163,14 +157,10 @@ class ProductDetail(View):
 
         Returns:
             The rendered productdetail.html template with the following context variables:
-                - totalitem: The total number of items in the user's cart, if the user is authenticated.
                 - products: The product with the given primary key.
 
         """
-        totalitem=0
-        if request.user.is_authenticated:
-            totalitem = len(Cart.objects.filter(user=request.user))
-        products = Products.objects.get(pk=pk)
+        products = get_object_or_404(Products, pk=pk)
         return render(request,"app/productdetail.html",locals())
 
 
@@ -199,13 +189,9 @@ class CustomerRegistrationView(View):
         Returns:
             The rendered customerregistration.html template with the following context variables:
                 - form: An instance of the CustomerRegistrationForm.
-                - totalitem: The total number of items in the user's cart, if the user is authenticated.
 
         """
         form = CustomerRegistrationForm()
-        totalitem=0
-        if request.user.is_authenticated:
-            totalitem = len(Cart.objects.filter(user=request.user))
         return render(request,'app/customerregistration.html', locals())
     def post(self,request):
         """
@@ -255,13 +241,9 @@ class ProfileView(View):
         Returns:
             The rendered profile.html template with the following context variables:
                 - form: An instance of the CustomerProfileForm.
-                - totalitem: The total number of items in the user's cart, if the user is authenticated.
 
         """
         form = CustomerProfileForm()
-        totalitem=0
-        if request.user.is_authenticated:
-            totalitem = len(Cart.objects.filter(user=request.user))
         return render (request, 'app/profile.html', locals())
     def post(self,request):
         """
@@ -297,9 +279,6 @@ class ProfileView(View):
 @login_required 
 def address(request):
     add = Customer.objects.filter(User=request.user)
-    totalitem=0
-    if request.user.is_authenticated:
-        totalitem = len(Cart.objects.filter(user=request.user))
     return render(request, 'app/address.html', locals())
 
 @method_decorator(login_required, name='dispatch')
@@ -330,14 +309,10 @@ class updateAddress(View):
             The rendered updateAddress.html template with the following context variables:
                 - add: The customer object with the given primary key.
                 - form: An instance of the CustomerProfileForm with the customer's current address values.
-                - totalitem: The total number of items in the user's cart, if the user is authenticated.
 
         """
         add = Customer.objects.get(pk=pk)
         form = CustomerProfileForm(instance=add)
-        totalitem=0
-        if request.user.is_authenticated:
-            totalitem = len(Cart.objects.filter(user=request.user))
         return render(request, 'app/updateAddress.html', locals())
     def post(self, request, pk):
         """
@@ -376,16 +351,19 @@ def add_to_cart(request):
         request: The HTTP request object.
 
     Returns:
-        A redirect to the '/cart' URL.
+        A redirect to the '/cart' URL, or a 404 response if the product does not exist.
 
     """
-    user=request.user
-    Products_id=request.GET.get('prod_id')
-    product=Products.objects.get(id=Products_id)
-    Cart(user=user,product=product).save()
+    try:
+        Products_id=int(request.GET.get('prod_id'))
+    except (TypeError, ValueError):
+        raise Http404("Product not found")
+    if not add_product(request.user, Products_id):
+        raise Http404("Product not found")
     return redirect("/cart")
 
 @login_required
+@ensure_csrf_cookie
 def show_cart(request):
     """
     Handles displaying the user's cart.
@@ -399,19 +377,13 @@ def show_cart(request):
             - cart: The Cart objects associated with the user.
             - amount: The total amount of the products in the cart (before adding shipping cost).
             - totalamount: The total amount of the products in the cart (including shipping cost).
-            - totalitem: The total number of items in the user's cart, if the user is authenticated.
 
     """
     user=request.user
-    cart=Cart.objects.filter(user=user)
-    amount=0
-    for p in cart:
-        value = p.quantity * p.product.discounted_price
-        amount = amount + value
-    totalamount = amount + 40
-    totalitem=0
-    if request.user.is_authenticated:
-        totalitem = len(Cart.objects.filter(user=request.user))
+    pricing = price_cart(user)
+    cart = pricing['lines']
+    amount = pricing['amount']
+    totalamount = pricing['totalamount']
     return render(request,'app/addtocart.html',locals())
 
 @login_required
@@ -427,21 +399,12 @@ def plus_cart(request):
 
     """
     if request.method == 'GET':
-        prod_id=request.GET['prod_id']
-        c = Cart.objects.get(Q(product=prod_id) & Q(user=request.user))
-        c.quantity+=1
-        c.save()
-        user = request.user
-        cart = Cart.objects.filter(user=user)
-        amount=0
-        for p in cart:
-            value = p.quantity * p.product.discounted_price
-            amount = amount + value
-        totalamount = amount + 40
+        prod_id=int(request.GET['prod_id'])
+        result = apply_cart_deltas(request.user, {prod_id: 1})
         data={
-            'quantity':c.quantity,
-            'amount':amount,
-            'totalamount':totalamount
+            'quantity':result['lines'][0]['quantity'],
+            'amount':result['amount'],
+            'totalamount':result['totalamount']
         }
         return JsonResponse (data)
 
@@ -458,21 +421,12 @@ def minus_cart(request):
 
     """
     if request.method == 'GET':
-        prod_id=request.GET['prod_id']
-        c = Cart.objects.get(Q(product=prod_id) & Q(user=request.user))
-        c.quantity-=1
-        c.save()
-        user = request.user
-        cart = Cart.objects.filter(user=user)
-        amount=0
-        for p in cart:
-            value = p.quantity * p.product.discounted_price
-            amount = amount + value
-        totalamount = amount + 40
+        prod_id=int(request.GET['prod_id'])
+        result = apply_cart_deltas(request.user, {prod_id: -1})
         data={
-            'quantity':c.quantity,
-            'amount':amount,
-            'totalamount':totalamount
+            'quantity':result['lines'][0]['quantity'],
+            'amount':result['amount'],
+            'totalamount':result['totalamount']
         }
         return JsonResponse (data)
 
@@ -489,22 +443,47 @@ def remove_cart(request):
 
     """
     if request.method == 'GET':
-        prod_id=request.GET['prod_id']
-        c = Cart.objects.get(Q(product=prod_id) & Q(user=request.user))
-        c.delete()
-        user = request.user
-        cart = Cart.objects.filter(user=user)
-        amount=0
-        for p in cart:
-            value = p.quantity * p.product.discounted_price
-            amount = amount + value
-        totalamount = amount + 40
+        prod_id=int(request.GET['prod_id'])
+        result = apply_cart_deltas(request.user, {prod_id: None})
         data={
-            'amount':amount,
-            'totalamount':totalamount
+            'amount':result['amount'],
+            'totalamount':result['totalamount']
         }
         return JsonResponse (data)
 
+@login_required
+@require_POST
+def cart_batch(request):
+    """
+    Handles a batch of cart quantity changes sent by the cart page.
+
+    The request body is JSON of the form
+    {"updates": [{"prod_id": 3, "delta": 2}, {"prod_id": 5, "remove": true}]}.
+    Updates for the same product are coalesced before being applied in a
+    single transaction.
+
+    Args:
+        request: The HTTP request object.
+
+    Returns:
+        A JSON response containing the changed lines and the new amount and total amount of the cart,
+        or a 400 response if the request body is malformed or a product's change exceeds MAX_CART_DELTA.
+
+    """
+    deltas = {}
+    try:
+        for update in json.loads(request.body)['updates']:
+            prod_id = int(update['prod_id'])
+            if update.get('remove') or deltas.get(prod_id, 0) is None:
+                deltas[prod_id] = None
+            else:
+                deltas[prod_id] = deltas.get(prod_id, 0) + int(update.get('delta', 0))
+                if abs(deltas[prod_id]) > MAX_CART_DELTA:
+                    raise ValueError('delta out of range')
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Invalid cart update'}, status=400)
+    return JsonResponse(apply_cart_deltas(request.user, deltas))
+
 @method_decorator(login_required, name='dispatch')    
 class checkout(View):
     """
@@ -520,7 +499,6 @@ class checkout(View):
 
         Returns:
             The rendered checkout.html template with the following context variables:
-                - totalitem: The total number of items in the user's cart, if the user is authenticated.
                 - user: The current user.
                 - add: The Customer objects associated with the user.
                 - cart_items: The Cart objects associated with the user.
@@ -528,17 +506,12 @@ class checkout(View):
                 - totalamount: The total amount of the products in the cart (including shipping cost).
 
         """
-        totalitem=0
-        if request.user.is_authenticated:
-            totalitem = len(Cart.objects.filter(user=request.user))
         user = request.user
         add = Customer.objects.filter(User=user)
-        cart_items=Cart.objects.filter(user=user)
-        famount = 0
-        for p in cart_items:
-            value = p.quantity * p.product.discounted_price
-            famount = famount + value
-        totalamount = famount + 40
+        pricing = price_cart(user)
+        cart_items = pricing['lines']
+        famount = pricing['amount']
+        totalamount = pricing['totalamount']
         #razoramount = int(totalamount * 100)
         #client = razorpay.Client(auth=(settings.RAZOR_KEY_ID,settings.RAZOR_KEY_SECRET ))
         #data = {"amount": razoramount, "currency": "R", "recipient": "order_rcptid_11"}
@@ -556,28 +529,32 @@ class checkout(View):
         #    )
         #    payment.save()
         return render(request, 'app/checkout.html',locals())
-"""   
-def payment_done(request):
-    order_id=request.GET.get('order_id')
-    payment_id=request.GET.get('payment_id')
-    cust_id=request.GET.get('cust_id')
 
-    user=request.user
+@login_required
+def payment_done(request):
+    """
+    Handles the payment gateway callback after a successful payment.
 
-    Customer=Customer.objects.get(id=cust_id)
+    Args:
+        request: The HTTP request object, with order_id, payment_id and cust_id in the query string.
 
-    payment=Payment.objects.get(razorpay_order_id=order_id)
-    payment.paid = True
-    payment.razorpay_payment_id = payment_id
-    payment.save()
+    Returns:
+        A redirect to the 'orders' URL, or a 404 response if the payment or address is unknown.
+        Repeated callbacks for the same order are harmless. If the cart changed since checkout,
+        no order is placed and the user is sent back to the checkout page.
 
-    # Tosave order details
-    cart = Cart.objects.filter(user=user)
-    for c in cart:
-        OrderPlaced(user=user, customer=customer, product=c.product, quantity=c.quantity, payment=payment).save()
-        c.delete()
-    return redirect("orders")
     """
+    order_id=request.GET.get('order_id')
+    payment_id=request.GET.get('payment_id')
+    cust_id=request.GET.get('cust_id')
+    try:
+        finalize_order(request.user, cust_id, order_id, payment_id)
+    except (Payment.DoesNotExist, Customer.DoesNotExist, ValueError):
+        raise Http404("Payment not found")
+    except AmountMismatch:
+        messages.error(request, "Your cart changed after checkout, please review it and pay again.")
+        return redirect("checkout")
+    return redirect("orders")
 
 @login_required
 def orders(request):
@@ -589,14 +566,10 @@ def orders(request):
 
     Returns:
         The rendered orders.html template with the following context variables:
-            - totalitem: The total number of items in the user's cart, if the user is authenticated.
-            - orders_placed: The total number of orders in the users cart.
+            - orders_placed: A page of the user's orders, newest first, with their lines.
 
     """
-    totalitem=0
-    if request.user.is_authenticated:
-        totalitem = len(Cart.objects.filter(user=request.user))
-    orders_placed = OrderPlaced.objects.filter(user=request.user)
+    orders_placed = order_history(request.user, cursor=request.GET.get('after'))
     return render(request, 'app/orders.html', locals())
     
  #def add_to_cart(request):
@@ -615,12 +588,29 @@ def search(request):
         request: The HTTP request object.
 
     Returns:
-        The search result
+        The rendered search.html template with the following context variables:
+            - query: The search text.
+            - product: A page of the matching products, most relevant first.
+
+    """
+    query = request.GET.get('search', '')
+    product = search_products(query, cursor=request.GET.get('after'))
+    return render(request, "app/search.html", locals())
+
+@login_required
+def search_suggest(request):
+    """
+    Returns search-as-you-type suggestions from the in-memory prefix index.
+
+    Args:
+        request: The HTTP request object, with the typed text in 'q' and an optional 'limit'.
+
+    Returns:
+        A JSON response containing the matching product titles and category names.
 
     """
-    query = request.GET['search']
-    totalitem = 0
-    if request.user.is_authenticated:
-       totalitem = len(Cart.objects.filter(user=request.user))
-    product = Products.objects.filter(Q(title__icontains=query))
-    return render(request, "app/search.html", locals())
\ No newline at end of file
+    try:
+        limit = min(int(request.GET.get('limit', SUGGEST_LIMIT)), SUGGEST_MAX_LIMIT)
+    except ValueError:
+        limit = SUGGEST_LIMIT
+    return JsonResponse({'suggestions': suggestion_index.suggest(request.GET.get('q', ''), limit)})
\ No newline at end of file
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 import os
 
@@ -39,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'app',
     'vendor',
     'rest_framework',
@@ -47,7 +49,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'app.middleware.StaticAssetMiddleware',
+    'app.middleware.QueryInspectionMiddleware',
+    'app.middleware.ReplicaRoutingMiddleware',
+    'app.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -68,12 +73,21 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'app.context_processors.cart_summary',
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'ec.wsgi.application'
+ASGI_APPLICATION = 'ec.asgi.application'
+
+# ec/asgi.py and ec/wsgi.py default SERVER_MODE to their own protocol. Under
+# ASGI the catalog and cart pages are served by the async views of
+# app/async_views.py; under WSGI by the sync views, which avoids running
+# async code through async_to_sync on every request.
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+ASYNC_VIEWS = SERVER_MODE == 'asgi'
 
 
 # Database
@@ -85,11 +99,123 @@ DATABASES = {
         'NAME': os.getenv('POSTGRES_DB'),
         'USER': os.getenv('POSTGRES_USER'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
-        'HOST': 'localhost',
-        'PORT': '5432',
+        'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+        'PORT': os.getenv('POSTGRES_PORT', '5432'),
+    }
+}
+
+# POSTGRES_CONN_MODE selects how PostgreSQL connections are reused:
+#   new         a fresh connection per request (Django's default);
+#   persistent  connections kept open for POSTGRES_CONN_MAX_AGE seconds and
+#               checked before reuse, so a dropped connection is replaced;
+#   pool        a psycopg connection pool shared by the worker's threads
+#               (requires the psycopg_pool package).
+# Persistent connections leak under ASGI, where requests do not reuse
+# threads, so there the default is new and persistent is refused.
+POSTGRES_CONN_MODE = os.getenv('POSTGRES_CONN_MODE', 'new' if SERVER_MODE == 'asgi' else 'persistent')
+if POSTGRES_CONN_MODE == 'persistent' and SERVER_MODE == 'asgi':
+    raise ImproperlyConfigured('POSTGRES_CONN_MODE=persistent cannot be used with SERVER_MODE=asgi; use new or pool.')
+if POSTGRES_CONN_MODE == 'persistent':
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('POSTGRES_CONN_MAX_AGE', 600))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+elif POSTGRES_CONN_MODE == 'pool':
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('POSTGRES_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.getenv('POSTGRES_POOL_MAX_SIZE', 10)),
+            'timeout': float(os.getenv('POSTGRES_POOL_TIMEOUT', 10)),
+        },
+    }
+elif POSTGRES_CONN_MODE != 'new':
+    raise ImproperlyConfigured(f'Unknown POSTGRES_CONN_MODE {POSTGRES_CONN_MODE!r}.')
+
+# Read replicas. POSTGRES_REPLICA_HOSTS lists the hosts of streaming replicas
+# of the default database, added as the aliases replica1, replica2, ...
+# app.routers.ReplicaRouter sends the reads of the read-only pages to them,
+# and a client that writes reads from the primary for REPLICA_PIN_SECONDS.
+DATABASE_REPLICAS = []
+for number, host in enumerate(filter(None, os.getenv('POSTGRES_REPLICA_HOSTS', '').split(',')), start=1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 10))
+DATABASE_ROUTERS = ['app.routers.ReplicaRouter']
+
+# Set DB_ENGINE=sqlite to run locally (e.g. the test suite) without PostgreSQL.
+# db.replica.sqlite3 stands in for a replica, read from when SQLITE_REPLICA=1;
+# create it with `migrate --database replica`, or copy db.sqlite3 over it to
+# "replicate" the primary.
+if os.getenv('DB_ENGINE') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        },
+        'replica': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.replica.sqlite3',
+        },
+    }
+    DATABASE_REPLICAS = ['replica'] if os.getenv('SQLITE_REPLICA') == '1' else []
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# CACHE_BACKEND selects the cache shared by the cart summaries, category
+# titles, product fragments, API tokens and suggestion index generations:
+#   locmem     per-process memory, for development and the test suite only;
+#   redis      a Redis server at CACHE_LOCATION (e.g. redis://127.0.0.1:6379/1),
+#              requires the redis package;
+#   memcached  a Memcached server at CACHE_LOCATION (e.g. 127.0.0.1:11211),
+#              requires the pymemcache package.
+# Production runs several processes, and must use redis or memcached: with
+# locmem, the signals invalidating cached data only reach the process that
+# made the change, and the others serve stale data until it expires.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'ec-default'),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+    'memcached': ('django.core.cache.backends.memcached.PyMemcacheCache', '127.0.0.1:11211'),
+}
+if CACHE_BACKEND not in CACHE_BACKENDS:
+    raise ImproperlyConfigured(f'Unknown CACHE_BACKEND {CACHE_BACKEND!r}.')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.getenv('CACHE_LOCATION', CACHE_BACKENDS[CACHE_BACKEND][1]),
     }
 }
 
+# Set QUERY_INSPECTION=1 to add X-DB-Queries and Server-Timing headers to every
+# response and log the requests running more than QUERY_BUDGET queries to the
+# 'app.queries' logger, with their repeated (N+1) statements.
+QUERY_INSPECTION = os.getenv('QUERY_INSPECTION') == '1'
+QUERY_BUDGET = int(os.getenv('QUERY_BUDGET', 20))
+
+# SESSION_MODE selects where sessions are stored:
+#   db              the session table, read by every request of a logged-in user;
+#   cached_db       the cache, written through to the session table, so most
+#                   requests read no session row (the cache must be shared by
+#                   all server processes, e.g. Redis, or they see stale sessions);
+#   signed_cookies  the signed (not encrypted) session cookie itself, with no
+#                   server-side state at all.
+SESSION_MODE = os.getenv('SESSION_MODE', 'db')
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+if SESSION_MODE not in SESSION_ENGINES:
+    raise ImproperlyConfigured(f'Unknown SESSION_MODE {SESSION_MODE!r}.')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODE]
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+        'vendor.authentication.CachedTokenAuthentication',
+    ],
+}
 
 
 # Password validation
@@ -127,8 +253,28 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Outside DEBUG, `manage.py collectstatic` writes content-hashed, precompressed
+# assets to STATIC_ROOT, served by app.middleware.StaticAssetMiddleware.
+if not DEBUG:
+    STORAGES = {
+        'default': {
+            'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        },
+        'staticfiles': {
+            'BACKEND': 'app.storage.PrecompressedManifestStaticFilesStorage',
+        },
+    }
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR/'media'
+# Media is served by app.media.serve_media. Set MEDIA_SENDFILE to
+# 'x-accel-redirect' (nginx, with an internal location at MEDIA_ACCEL_PREFIX
+# aliased to MEDIA_ROOT) or 'x-sendfile' (Apache/lighttpd) to let the front
+# server transfer the file instead of the Python worker.
+MEDIA_SENDFILE = os.getenv('MEDIA_SENDFILE', '')
+MEDIA_ACCEL_PREFIX = os.getenv('MEDIA_ACCEL_PREFIX', '/protected-media/')
+MEDIA_CACHE_MAX_AGE = 86400
 LOGIN_REDIRECT_URL = '/profile/'
 
 # Default primary key field type
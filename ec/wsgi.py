@@ -12,5 +12,6 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ec.settings')
+os.environ.setdefault('SERVER_MODE', 'wsgi')
 
 application = get_wsgi_application()